@@ -1,4 +1,6 @@
 
+from registry import Registry
+
 class Cells():
     # energy storage capacity
     # energy production rate
@@ -10,7 +12,10 @@ class Cells():
     # adaptation and evolution rate
     # energy consumption rate
 
-    all_cells_list: list = []
+    # the producer and the distributor cells, their slots are interleaved by the registry_kind of their class
+    all_cells_list: Registry = Registry(kind_count=2)
+    # no instance dicts, the subclasses list their own attributes
+    __slots__: tuple = ()
 
     def __init__(self, position_x: int, position_y: int, energy_capacity: float,
                  energy_production_rate: float, resilience: float, lifespan: float,
@@ -0,0 +1,211 @@
+
+# the whole state of a simulation in one file, to go on later or to fork experiments from a warmed-up world
+# the file is an uncompressed .npz with one member per column, so that it is mapped by a MapStore instead of being read
+import json
+import os
+import sys
+import numpy as np
+from general import General
+from map_store import MapStore, MapLayer
+from producers import Producers
+from distributors import Distributors
+from cells import Cells
+from utility import Utility, Corpse, Food, Pollen
+from random_streams import RandomStream
+from simulation import Simulation
+
+class Checkpoint():
+
+    version: int = 2
+    # the grids of General, the object matrices are made again from the slots
+    grid_names: tuple[str, ...] = ("cell_type_matrix", "cell_slot_matrix", "utility_type_matrix", "utility_slot_matrix")
+    utility_kinds: dict[str, type] = {"corpses": Corpse, "foods": Food, "pollen": Pollen}
+
+    @staticmethod
+    def map_layer_names() -> list[str]:
+        return [value.name for value in vars(General).values() if isinstance(value, MapLayer)]
+
+    @staticmethod
+    def streams(simulation: Simulation) -> dict[str, RandomStream]:
+        return {"producers": Producers.random, "mutations": Producers.mutation_random, "distributors": Distributors.random,
+                "utilities": Utility.random, "climate": simulation.climate_random}
+
+    @classmethod
+    def save(cls, simulation: Simulation, path: str, include_map: bool = False) -> str:
+        """
+        Writes the state between two days (after run_day), gives back the path of the file (np.savez adds .npz).
+        1) the map: the temperature layer changes with the seasons, so it is always saved,
+           the other layers only with include_map, else the map file is referred to by its path
+        2) the grids, the column stores of the producers, the distributors and the utilities, the carried pollen
+        3) the order of every registry as slots, the random streams and the calendar
+        """
+        arrays: dict[str, np.ndarray] = {}
+        map_layer_names: list[str] = cls.map_layer_names()
+        for layer_name in (map_layer_names if include_map else ["temperature_smoothed_matrix"]):
+            arrays[layer_name] = General.get_map_store().layer(layer_name)
+        for grid_name in cls.grid_names:
+            arrays[f"general.{grid_name}"] = getattr(General, grid_name)
+
+        for name, values in Producers.store.get_state().items():
+            arrays[f"producers.{name}"] = values
+        arrays["producers.registry"] = Producers.all_producer_cells_list.slots()
+
+        for name, values in Distributors.store.get_state().items():
+            arrays[f"distributors.{name}"] = values
+        distributor_cells: list[Distributors] = list(Distributors.all_distributor_cells_list)
+        arrays["distributors.registry"] = Distributors.all_distributor_cells_list.slots()
+        arrays["distributors.carried_pollen"] = np.array([pollen_slot for cell in distributor_cells for pollen_slot in cell.current_polen_list], dtype=np.int64)
+        arrays["distributors.carried_counts"] = np.array([len(cell.current_polen_list) for cell in distributor_cells], dtype=np.int64)
+
+        # the producers and the distributors are mixed in all_cells_list
+        all_cells: list[Cells] = list(Cells.all_cells_list)
+        arrays["cells.registry_types"] = np.array([cell.type_code for cell in all_cells], dtype=np.uint8)
+        arrays["cells.registry"] = np.array([cell.slot for cell in all_cells], dtype=np.int64)
+
+        for name, values in Utility.store.get_state().items():
+            arrays[f"utilities.{name}"] = values
+        for registry_name, kind in cls.utility_kinds.items():
+            arrays[f"{registry_name}.registry"] = kind.registry.slots()
+
+        stream_states: dict[str, dict] = {}
+        for stream_name, stream in cls.streams(simulation).items():
+            stream_states[stream_name], arrays[f"random.{stream_name}.block"] = stream.get_state()
+
+        metadata: dict = {
+            "version": cls.version,
+            "map_included": include_map,
+            "map_path": os.path.abspath(General.get_map_store().path),
+            "days_elapsed": simulation.days_elapsed,
+            "day": simulation.day,
+            "month": simulation.month,
+            "year": simulation.year,
+            "temperature_version": simulation.temperature_version,
+            "vectorized_producers": simulation.vectorized_producers,
+            "streams": stream_states,
+            "utility_pool": {"free_views": {str(type_code): len(free_views) for type_code, free_views in Utility.free_views.items()},
+                             "requests": Utility.pool_requests, "hits": Utility.pool_hits},
+        }
+        arrays["metadata"] = np.frombuffer(json.dumps(metadata).encode(), dtype=np.uint8)
+        # uncompressed, a compressed member can not be mapped
+        np.savez(path, **arrays)
+        return path if path.endswith(".npz") else path + ".npz"
+
+    @classmethod
+    def load(cls, path: str) -> Simulation:
+        """
+        Replaces the state of the process with the one of the checkpoint and gives back its simulation.
+        the columns are mapped copy-on-write from the file (the file stays the same), only the small grids are copied
+        the simulation then goes on exactly like the one that was saved
+        """
+        checkpoint = MapStore(path)
+        metadata: dict = json.loads(checkpoint.layer("metadata").tobytes())
+        if metadata["version"] != cls.version:
+            raise ValueError(f"checkpoint version {metadata['version']} is not supported")
+        # the state is restored into an empty world, like the one a new Simulation starts from
+        Simulation.reset_state()
+
+        # the map
+        if metadata["map_included"]:
+            General.map_store = checkpoint
+        else:
+            General.load_map(metadata["map_path"])
+            General.map_store.layers["temperature_smoothed_matrix"] = checkpoint.layer("temperature_smoothed_matrix")
+
+        # the grids are copied into the arrays of General, the spatial indices refer to them
+        for grid_name in cls.grid_names:
+            np.copyto(getattr(General, grid_name), checkpoint.layer(f"general.{grid_name}"))
+        General.cell_index.rebuild()
+        General.utility_index.rebuild()
+        # everything is drawn again
+        General.dirty_tile_matrix[:] = True
+
+        # the producer cells
+        Producers.store.set_state({name: checkpoint.layer(f"producers.{name}") for name in cls.store_state_names(Producers.store)})
+        producer_views: list = Producers.store.views
+        for slot in Producers.store.active_slots().tolist():
+            producer_cell: Producers = object.__new__(Producers)
+            producer_cell.slot = slot
+            producer_views[slot] = producer_cell
+
+        # the distributor cells, the carried pollen are in the order of the registry
+        Distributors.store.set_state({name: checkpoint.layer(f"distributors.{name}") for name in cls.store_state_names(Distributors.store)})
+        distributor_views: list = Distributors.store.views
+        carried_pollen: list[int] = checkpoint.layer("distributors.carried_pollen").tolist()
+        carried_ends = np.cumsum(checkpoint.layer("distributors.carried_counts")).tolist()
+        carried_start: int = 0
+        for slot, carried_end in zip(checkpoint.layer("distributors.registry").tolist(), carried_ends):
+            distributor_cell: Distributors = object.__new__(Distributors)
+            distributor_cell.slot = slot
+            distributor_cell.current_polen_list = carried_pollen[carried_start:carried_end]
+            carried_start = carried_end
+            distributor_views[slot] = distributor_cell
+
+        # the utilities, with the same number of views to be reused
+        Utility.store.set_state({name: checkpoint.layer(f"utilities.{name}") for name in cls.store_state_names(Utility.store)})
+        utility_views: list = Utility.store.views
+        active_slots = Utility.store.active_slots()
+        for slot, type_code in zip(active_slots.tolist(), Utility.store.type_code[active_slots].tolist()):
+            utility: Utility = object.__new__(Utility.kinds[type_code])
+            utility.slot = slot
+            utility_views[slot] = utility
+        pool: dict = metadata["utility_pool"]
+        for type_code, free_view_count in pool["free_views"].items():
+            Utility.free_views[int(type_code)] = [object.__new__(Utility.kinds[int(type_code)]) for _ in range(free_view_count)]
+        Utility.pool_requests, Utility.pool_hits = pool["requests"], pool["hits"]
+
+        # the object matrices and the registries, in the saved order
+        cell_views: dict[int, list] = {General.producer_type: producer_views, General.distributor_type: distributor_views}
+        for type_code, views in cell_views.items():
+            grid_ys, grid_xs = np.nonzero(General.cell_type_matrix == type_code)
+            General.all_cells_matrix[grid_ys, grid_xs] = cls.object_array(views, General.cell_slot_matrix[grid_ys, grid_xs])
+        grid_ys, grid_xs = np.nonzero(General.utility_slot_matrix != General.empty_slot)
+        General.all_utility_matrix[grid_ys, grid_xs] = cls.object_array(utility_views, General.utility_slot_matrix[grid_ys, grid_xs])
+        cls.fill_registry(Producers.all_producer_cells_list, producer_views, checkpoint.layer("producers.registry"))
+        cls.fill_registry(Distributors.all_distributor_cells_list, distributor_views, checkpoint.layer("distributors.registry"))
+        for type_code, slot in zip(checkpoint.layer("cells.registry_types").tolist(), checkpoint.layer("cells.registry").tolist()):
+            Cells.all_cells_list.append(cell_views[type_code][slot])
+        for registry_name, kind in cls.utility_kinds.items():
+            cls.fill_registry(kind.registry, utility_views, checkpoint.layer(f"{registry_name}.registry"))
+
+        # the random streams and the calendar
+        simulation: Simulation = object.__new__(Simulation)
+        Producers.random, Producers.mutation_random, Distributors.random, Utility.random, simulation.climate_random = (
+            RandomStream(), RandomStream(), RandomStream(), RandomStream(), RandomStream())
+        for stream_name, stream in cls.streams(simulation).items():
+            stream.set_state(metadata["streams"][stream_name], checkpoint.layer(f"random.{stream_name}.block"))
+        simulation.vectorized_producers = metadata["vectorized_producers"]
+        simulation.days_elapsed = metadata["days_elapsed"]
+        simulation.day, simulation.month, simulation.year = metadata["day"], metadata["month"], metadata["year"]
+        simulation.temperature_version = metadata["temperature_version"]
+        simulation.temperature_tiles = None
+        simulation.temperature_tiles_version = -1
+        return simulation
+
+    @staticmethod
+    def store_state_names(store) -> list[str]:
+        return list(store.columns) + ["color", "alive", "free_slots"]
+
+    @staticmethod
+    def object_array(views: list, slots: np.ndarray) -> np.ndarray:
+        objects = np.empty(len(slots), dtype=object)
+        objects[:] = [views[slot] for slot in slots.tolist()]
+        return objects
+
+    @staticmethod
+    def fill_registry(registry, views: list, slots: np.ndarray) -> None:
+        registry.append_many([views[slot] for slot in slots.tolist()], slots)
+
+# e.g. "python checkpoint.py save 1800 year5" writes year5.npz after 5 years (with the map 1234 and the seed 7),
+# "python checkpoint.py run year5.npz 360" goes on for one more year from it
+if __name__ == "__main__":
+    if sys.argv[1] == "save":
+        test_simulation = Simulation(map_seed=1234, seed=7)
+        test_simulation.run_until(int(sys.argv[2]))
+        print(f"saved {Checkpoint.save(test_simulation, sys.argv[3])} at day {test_simulation.days_elapsed}")
+    else:
+        test_simulation = Checkpoint.load(sys.argv[2])
+        test_simulation.run_until(test_simulation.days_elapsed + int(sys.argv[3]))
+    snapshot = test_simulation.snapshot()
+    print(f"day {snapshot.days_elapsed}: {snapshot.producer_count} producers, {snapshot.distributor_count} distributors, "
+          f"{snapshot.corpse_count} corpses, {snapshot.food_count} foods, {snapshot.pollen_count} pollen")
+    sys.exit()
@@ -0,0 +1,33 @@
+
+# letters over the tiles, to see what the grids of General hold (N3 / N4 in the visual)
+import pygame
+import numpy as np
+
+class LabelOverlay():
+
+    # the glyphs are rendered once into an atlas, a frame only blits parts of it
+    def __init__(self, font: pygame.font.Font, labels: dict[int, str], color: tuple[int, int, int], tile_size: int = 10):
+        self.tile_size: int = tile_size
+        glyphs: dict[int, pygame.Surface] = {type_code: font.render(text, True, color) for type_code, text in labels.items()}
+        self.atlas = pygame.Surface((sum(glyph.get_width() for glyph in glyphs.values()), max(glyph.get_height() for glyph in glyphs.values())), pygame.SRCALPHA)
+        # type code -> area of its glyph in the atlas (None if the type has no label, e.g. the empty type)
+        self.areas: list = [None]*(max(labels)+1)
+        atlas_x: int = 0
+        for type_code, glyph in glyphs.items():
+            # copied as they are, alpha included (the atlas is transparent, max() keeps the glyph)
+            self.atlas.blit(glyph, (atlas_x, 0), special_flags=pygame.BLEND_RGBA_MAX)
+            self.areas[type_code] = pygame.Rect(atlas_x, 0, glyph.get_width(), glyph.get_height())
+            atlas_x += glyph.get_width()
+        self.labelled_types = np.array(list(labels))
+
+    def draw(self, target: pygame.Surface, type_matrix: np.ndarray, tile_rows: slice, tile_columns: slice) -> None:
+        # the labelled tiles of the region are found on the type grid, then all of their glyphs are blitted in one call
+        types = type_matrix[tile_rows, tile_columns]
+        tile_ys, tile_xs = np.nonzero(np.isin(types, self.labelled_types))
+        if not(len(tile_ys)): return
+        areas: list = self.areas
+        tile_size: int = self.tile_size
+        target.blits([(self.atlas, (x, y), areas[type_code]) for type_code, x, y in zip(
+            types[tile_ys, tile_xs].tolist(),
+            ((tile_columns.start+tile_xs)*tile_size+2).tolist(),
+            ((tile_rows.start+tile_ys)*tile_size+1).tolist())], doreturn=False)
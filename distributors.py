@@ -1,7 +1,12 @@
 
 from general import General
-from utility import Corpse, Food, Pollen
+from utility import Utility, Corpse, Food, Pollen
 from cells import Cells
+from registry import Registry
+from population import DistributorStore
+from spatial_index import SpatialIndex
+from random_streams import RandomStream
+from trait_schema import StartingTraits
 import numpy as np
 import sys
 
@@ -21,8 +26,41 @@ class Distributors(Cells):
     #   symbiosis/mutualism or social hierarchy
     # reactions to environmental dynamics
 
-    all_distributor_cells_list: list = []
-    all_distributor_cells_matrix = np.empty((General.world_size//10, General.world_size//10), dtype=object)
+    all_distributor_cells_list: Registry = Registry()
+    type_code: int = General.distributor_type
+    # columnar storage of all the distributor cells, an instance is only a view on its slot (and its carried pollen)
+    store: DistributorStore = DistributorStore()
+    # the position of the distributor cells in Cells.all_cells_list
+    registry_kind: int = 1
+    # random numbers of the distributor cells, seeded by the simulation
+    random: RandomStream = RandomStream()
+    # the traits of the starting distributor cells, they do not mutate
+    # (name, start_low, start_high, digits), see StartingTraits
+    trait_schema: StartingTraits = StartingTraits([
+        ("energy_capacity",        0.25,   0.5,     4),
+        ("energy_production_rate", 0.005,  0.0025,  4),
+        ("resilience",             0.001,  1.0,     4),
+        ("lifespan",               0.125,  0.25,    4),
+        ("aging_speed",            0.0025, 0.00625, 4),
+        ("reproduction_rate",      0.004,  0.008,   4),
+        ("offspring_count",        2,      16,      0),
+        ("evolution_rate",         0.001,  1.0,     4),
+        ("max_speed",              0.5,    1.0,     4),
+        ("polen_detection_range",  50,     500,     0),
+    ])
+    # the pollen and the producer cells are reached up to 2 grid cells away (manhattan distance)
+    reach: int = 2
+    # color of a distributor cell, indexed by its max_pollen_carry_amount
+    carry_amount_colors: np.ndarray = np.array([
+        (0, 0, 0), # unused
+        (199, 21, 133),
+        (255, 20, 147),
+        (255, 105, 180),
+        (255, 209, 220),
+        (255, 182, 193),
+    ], dtype=np.uint8)
+    # every attribute but the slot and the carried pollen is in the store
+    __slots__: tuple = ("slot", "current_polen_list")
 
     def __init__(self, position_x: int, position_y: int, energy_capacity: float,
                  energy_production_rate: float, resilience: float, lifespan: float,
@@ -31,6 +69,8 @@ class Distributors(Cells):
                  current_energy: float, age: float, temperature_level: float,
                  ):
         
+        # the slot should be taken first, since every attribute is written into the store
+        self.slot: int = Distributors.store.allocate(self)
         super().__init__(position_x, position_y, energy_capacity, energy_production_rate,
                     resilience, lifespan, aging_speed, reproduction_rate, offspring_count,
                     evolution_rate, current_energy, age, temperature_level)
@@ -39,41 +79,60 @@ class Distributors(Cells):
         self.grid_y: int = int(position_y//10)
 
         self.max_speed = max_speed
-        # this value gets derived from the speed. since they are reverse
-        self.max_pollen_carry_amount = max(1, min(5, round(8*max_speed-3)))
+        self.max_pollen_carry_amount: int = Distributors.derive_max_pollen_carry_amount(max_speed)
         self.polen_detection_range = polen_detection_range 
-        self.current_polen_list: list = []
-        self.real_sensed_area = np.empty((General.world_size//10, General.world_size//10), dtype=[('position', 'i,i'), ('cell', object), ('utility', object)])
-
-        self.name: str = f"D-{self.max_pollen_carry_amount}"
-        self.distributors_colors: dict = {
-            5 : (255, 182, 193),
-            4 : (255, 209, 220),
-            3 : (255, 105, 180),
-            2 : (255, 20, 147),
-            1 : (199, 21, 133)
-        } 
-        self.color: tuple[int, int, int] = self.distributors_colors[self.max_pollen_carry_amount] 
-        self.energy_consumption_rate: float = round((0.1*self.energy_capacity+ \
-                                        self.max_speed**(1/1.5) * 0.2 + \
-                                        self.max_pollen_carry_amount*0.15 + \
-                                        abs(self.temperature_level-1.0)*0.8 + \
-                                        self.polen_detection_range**(1/1.5) * 0.1) * \
-                                        (1-self.resilience*0.02), 4)
-        # normalize this value
-        self.energy_consumption_rate = round((self.energy_consumption_rate - 2) / 6.5, 4)
-        self.psychological_stress = round(((1-self.current_energy/self.energy_capacity)**(1/2) + \
-                                    self.reproduction_rate*self.offspring_count/5 + \
-                                    (self.age/self.lifespan)**(1/3) + \
-                                    self.max_pollen_carry_amount*0.12) * \
-                                    (1+self.evolution_rate*0.15) * \
-                                    (1-self.resilience*0.3), 4)
-        self.psychological_stress = round((self.psychological_stress-0.5)/1.1, 4)
+        # slots of the carried pollen in the utility store
+        self.current_polen_list: list[int] = []
 
-        
+        self.color = Distributors.carry_amount_colors[self.max_pollen_carry_amount]
+        self.energy_consumption_rate: float = Distributors.derive_energy_consumption_rate(energy_capacity, max_speed, self.max_pollen_carry_amount,
+                                                                                         temperature_level, polen_detection_range, resilience)
+        self.psychological_stress: float = Distributors.derive_psychological_stress(current_energy, energy_capacity, reproduction_rate, offspring_count,
+                                                                                   age, lifespan, self.max_pollen_carry_amount, evolution_rate, resilience)
 
     def __repr__(self):
         return self.name
+
+    @property
+    def name(self) -> str:
+        return f"D-{self.max_pollen_carry_amount}"
+
+    # the derived parameters, shared by every distributor cell
+    @staticmethod
+    def derive_max_pollen_carry_amount(max_speed: float) -> int:
+        # this value gets derived from the speed. since they are reverse
+        return max(1, min(5, round(8*max_speed-3)))
+
+    @staticmethod
+    def derive_energy_consumption_rate(energy_capacity: float, max_speed: float, max_pollen_carry_amount: int, temperature_level: float,
+                                       polen_detection_range: int, resilience: float) -> float:
+        energy_consumption_rate = round((0.1*energy_capacity+ \
+                                        max_speed**(1/1.5) * 0.2 + \
+                                        max_pollen_carry_amount*0.15 + \
+                                        abs(temperature_level-1.0)*0.8 + \
+                                        polen_detection_range**(1/1.5) * 0.1) * \
+                                        (1-resilience*0.02), 4)
+        # normalize this value
+        return round((energy_consumption_rate - 2) / 6.5, 4)
+
+    @staticmethod
+    def derive_psychological_stress(current_energy: float, energy_capacity: float, reproduction_rate: float, offspring_count: int, age: float,
+                                    lifespan: float, max_pollen_carry_amount: int, evolution_rate: float, resilience: float) -> float:
+        psychological_stress = round(((1-current_energy/energy_capacity)**(1/2) + \
+                                    reproduction_rate*offspring_count/5 + \
+                                    (age/lifespan)**(1/3) + \
+                                    max_pollen_carry_amount*0.12) * \
+                                    (1+evolution_rate*0.15) * \
+                                    (1-resilience*0.3), 4)
+        return round((psychological_stress-0.5)/1.1, 4)
+
+    @property
+    def color(self) -> tuple[int, int, int]:
+        return tuple(Distributors.store.color[self.slot].tolist())
+
+    @color.setter
+    def color(self, value: tuple[int, int, int]) -> None:
+        Distributors.store.color[self.slot] = value
     
     @classmethod
     def generate_starting_distributor_cells(cls, distributor_cell_count: int) -> None:
@@ -99,21 +158,20 @@ class Distributors(Cells):
         18) temperature_level
         """
 
-        linear_indices = np.random.choice(General.total_grid_cells, size=distributor_cell_count, replace=False)
-        x_indices, y_indices = np.unravel_index(linear_indices, (General.world_size//10, General.world_size//10))
+        # only the grid cells without a producer cell are available
+        free_indices = np.flatnonzero(General.cell_type_matrix.ravel() == General.empty_type)
+        if distributor_cell_count > len(free_indices):
+            raise ValueError("distributor_cell_count exceeds available cells")
+        linear_indices = Distributors.random.sample(free_indices, distributor_cell_count)
+        y_indices, x_indices = np.unravel_index(linear_indices, (General.world_size//10, General.world_size//10))
+        genomes = Distributors.trait_schema.sample(Distributors.random, distributor_cell_count)
+        whole = Distributors.trait_schema.whole
         for i in range(distributor_cell_count):
             x_idx, y_idx = x_indices[i], y_indices[i]
             pos_x, pos_y = x_idx*10, y_idx*10
-            energy_capacity = round(np.random.uniform(0.25, 0.5), 4)
-            energy_production_rate = round(np.random.uniform(0.005, 0.0025), 4)
-            resilience = round(np.random.uniform(0.001, 1.0), 4)
-            lifespan = round(np.random.uniform(0.125, 0.25), 4)
-            aging_speed = round(np.random.uniform(0.0025, 0.00625), 4)
-            reproduction_rate = round(np.random.uniform(0.004, 0.008) ,4)
-            offspring_count = np.random.randint(2, 16)
-            evolution_rate = round(np.random.uniform(0.001, 1.0), 4)
-            max_speed = round(np.random.uniform(0.5, 1.0), 4)
-            pollen_detection_range = np.random.randint(50, 500)
+            traits = [int(value) if is_whole else value for value, is_whole in zip(genomes[i].tolist(), whole.tolist())]
+            (energy_capacity, energy_production_rate, resilience, lifespan, aging_speed, reproduction_rate,
+             offspring_count, evolution_rate, max_speed, pollen_detection_range) = traits
             new_distributor_cell = Distributors(
                 pos_x, pos_y,
                 energy_capacity,
@@ -130,74 +188,62 @@ class Distributors(Cells):
                 0.0,
                 General.temperature_matrix[y_idx, x_idx]
             )
-            General.all_cells_matrix[y_idx, x_idx] = new_distributor_cell
+            General.set_cell(y_idx, x_idx, new_distributor_cell)
             Distributors.all_distributor_cells_list.append(new_distributor_cell)
             Cells.all_cells_list.append(new_distributor_cell)
 
     def die(self) -> None:
         Distributors.all_distributor_cells_list.remove(self)
         Cells.all_cells_list.remove(self)
-        General.all_cells_matrix[int(self.position_y//10), int(self.position_x//10)] = None
-        General.all_utility_matrix[int(self.position_y//10), int(self.position_x//10)] = Corpse(self.position_x, self.position_y)
+        General.set_cell(int(self.position_y//10), int(self.position_x//10), None)
+        General.set_utility(int(self.position_y//10), int(self.position_x//10), Corpse(self.position_x, self.position_y))
+        Distributors.store.release(self.slot)
+        # the carried pollen are lost with the distributor cell
+        for pollen_slot in self.current_polen_list:
+            Utility.release_slot(pollen_slot)
+        self.current_polen_list.clear()
 
     def produce_energy(self) -> None:
         self.current_energy += self.energy_production_rate
     
-    def pick_pollen(self, pollen: Pollen) -> None:
-        pollen.dropped_by = None
-        self.current_polen_list.append(pollen)
-        General.all_utility_matrix[int(pollen.position_y//10), int(pollen.position_x//10)] = None
-        Pollen.all_pollen_list.remove(pollen)
-
-    def drop_pollen(self, pollen: Pollen, position_x = 0, position_y = 0) -> None:
+    def pick_pollen(self, pollen_slot: int) -> None:
+        # only the slot of the pollen moves, its genome stays in the utility store
+        store = Utility.store
+        store.dropped_by[pollen_slot] = -1
+        self.current_polen_list.append(pollen_slot)
+        General.set_utility(int(store.position_y[pollen_slot]//10), int(store.position_x[pollen_slot]//10), None)
+        Pollen.all_pollen_list.remove(store.views[pollen_slot])
+        store.on_ground[pollen_slot] = False
+
+    def drop_pollen(self, pollen_slot: int, position_x = 0, position_y = 0) -> None:
         # when the pollen is dropped, its position gets updated
+        store = Utility.store
         if not(position_x or position_y): # if the position is not given, then it will be the current position of the distributor cell
-            pollen.position_x, pollen.position_y = self.position_x, self.position_y
-        else: # if the position is given, then it will be the given position for the producer cells
-            pollen.position_x, pollen.position_y = position_x, position_y
-        pollen.dropped_by = self
-        self.current_polen_list.remove(pollen)
-        General.all_utility_matrix[int(self.position_y//10), int(self.position_x//10)] = pollen
-        Pollen.all_pollen_list.append(pollen)
+            position_x, position_y = self.position_x, self.position_y
+        # else the given position, for the producer cells
+        store.position_x[pollen_slot], store.position_y[pollen_slot] = position_x, position_y
+        store.dropped_by[pollen_slot] = self.slot
+        self.current_polen_list.remove(pollen_slot)
+        General.set_utility(int(position_y//10), int(position_x//10), store.views[pollen_slot])
+        Pollen.all_pollen_list.append(store.views[pollen_slot])
+        store.on_ground[pollen_slot] = True
 
     def move(self) -> None:
-        candidate_sense_are = General.area_1x1[:]
-        np.random.shuffle(candidate_sense_are)
-        while True:
-            if candidate_sense_are:
-                move_x, move_y = candidate_sense_are.pop()
-            else: # if not any possible move direction, that dont move
-                return
-            if (0 <= self.position_x + move_x < General.world_size) and (0 <= self.position_y+move_y < General.world_size) \
-                and (General.all_cells_matrix[int((self.position_y+move_y)//10), int((self.position_x+move_x)//10)] is None):
-                break
-        General.all_cells_matrix[self.position_y//10, self.position_x//10] = None
-        self.position_x += move_x
-        self.position_y += move_y
-        General.all_cells_matrix[self.position_y//10, self.position_x//10] = self
-
-    def get_sensed_area(self) -> None:
-        for dx, dy in General.area_10x10:
-            if (0 <= self.position_x+dx < General.world_size) and (0 <= self.position_y+dy < General.world_size):
-                corresponding_matrix_x, corresponding_matrix_y = int((self.position_x+dx)//10), int((self.position_y+dy)//10)
-                possible_cell = General.all_cells_matrix[corresponding_matrix_y, corresponding_matrix_x]
-                possible_utility = General.all_utility_matrix[corresponding_matrix_y, corresponding_matrix_x]
-                if possible_cell:
-                    if isinstance(possible_cell, (Distributors)) and (possible_cell is not self) or \
-                        hasattr(possible_cell, "productivity_level"):
-                        self.real_sensed_area[(corresponding_matrix_y, corresponding_matrix_x)]["cell"] = possible_cell
-                if possible_utility:
-                    if isinstance(possible_utility, (Food, Corpse, Pollen)):
-                        self.real_sensed_area[(corresponding_matrix_y, corresponding_matrix_x)]["utility"] = possible_utility
-                # if there is not cell or utility in the sensed area, then set it to None
-                if not(possible_cell): self.real_sensed_area[(corresponding_matrix_y, corresponding_matrix_x)]["cell"] = None
-                if not(possible_utility): self.real_sensed_area[(corresponding_matrix_y, corresponding_matrix_x)]["utility"] = None
+        # a random grid cell of the 1x1 area without a cell
+        possible_moves = General.neighbourhood_1x1.free_around(int(self.position_y//10), int(self.position_x//10), General.cell_type_matrix)
+        if not(len(possible_moves)): # if not any possible move direction, that dont move
+            return
+        grid_y, grid_x = Distributors.random.choice(possible_moves).tolist()
+        General.set_cell(int(self.position_y//10), int(self.position_x//10), None)
+        self.position_x, self.position_y = grid_x*10, grid_y*10
+        General.set_cell(grid_y, grid_x, self)
+
+    def sense(self, type_index: SpatialIndex, type_code: int) -> list[list[int]]:
+        # grid positions [[y1, x1], [y2, x2], ...] of the given type within reach, from the spatial index of General
+        return type_index.within_distance(int(self.position_y//10), int(self.position_x//10), Distributors.reach, type_code).tolist()
 
     def main_loop_distributor_cells(self) -> None:
-        # restart the sensed area for other cells and utilities 
-        self.get_sensed_area()
-        
-        if (self.age > self.lifespan + np.random.uniform(0, 0.25) * (1+self.resilience)):
+        if (self.age > self.lifespan + Distributors.random.uniform(0, 0.25) * (1+self.resilience)):
             self.die()
             return
         else:
@@ -205,79 +251,36 @@ class Distributors(Cells):
             self.current_energy = round(self.current_energy-self.energy_consumption_rate, 4)
 
         # movement logic
-        if np.random.random() < self.max_speed:
+        if Distributors.random.random() < self.max_speed:
             self.move()
 
-        # find the locations of the utilities in the sensed area
-        utility_types = np.array(
-            [type(entry['utility']) if entry['utility'] is not None else None
-            for entry in self.real_sensed_area.flatten()], dtype=object).reshape(General.world_size//10, General.world_size//10)
-        sensed_pollen_locations_matrix = np.argwhere(utility_types == Pollen)
-        #print(f"pollen locations: {sensed_pollen_locations_matrix}")
-        sensed_food_locations = np.argwhere(utility_types == Food)
-        sensed_corpse_locations = np.argwhere(utility_types == Corpse)
-        # find the locations of the cells in the sensed area
-        cell_types = np.array(
-            [type(entry['cell']) if entry['cell'] is not None else None
-            for entry in self.real_sensed_area.flatten()], 
-            dtype=object
-            ).reshape(General.world_size//10, General.world_size//10)
-        is_producer = np.array(
-            [hasattr(cell["cell"], 'main_loop_producer_cells') 
-            for cell in self.real_sensed_area.flatten()],
-            dtype=bool
-        ).reshape(General.world_size//10, General.world_size//10)
-        sensed_producer_cell_locations = np.argwhere(is_producer)  # Returns [[y1, x1], [y2, x2], ...]
-        sensed_distributor_cell_locations = np.argwhere(cell_types == Distributors) 
-
         # polen logic
         # pick up pollen
-        if (sensed_pollen_locations_matrix.any()) and (len(self.current_polen_list) < self.max_pollen_carry_amount):
-            corresponding_matrix_x, corresponding_matrix_y = int(self.position_x//10), int(self.position_y//10)
-            
-            for (sensed_y, sensed_x) in sensed_pollen_locations_matrix:
-                
-                distance_to_pollen_matrix = abs(corresponding_matrix_x - sensed_x) + abs(corresponding_matrix_y - sensed_y)
-                pollen_to_be_potentially_picked_up: Pollen = General.all_utility_matrix[sensed_y, sensed_x]
-                # the pollen should be close enough and not already dropped by the same distributor cell
-                if(distance_to_pollen_matrix <= 2) and (pollen_to_be_potentially_picked_up.dropped_by != self):
-                    # Ensure this is actually a Pollen object
-                    self.pick_pollen(pollen_to_be_potentially_picked_up)
-                    print("pollen picked up")
+        if len(self.current_polen_list) < self.max_pollen_carry_amount:
+            for (sensed_y, sensed_x) in self.sense(General.utility_index, General.pollen_type):
+                pollen_slot: int = int(General.utility_slot_matrix[sensed_y, sensed_x])
+                # the pollen should not be already dropped by the same distributor cell
+                if Utility.store.dropped_by[pollen_slot] != self.slot:
+                    self.pick_pollen(pollen_slot)
 
         # drop pollen if near a producer cell
-        if (sensed_producer_cell_locations.any()) and (self.current_polen_list):
-            corresponding_matrix_x, corresponding_matrix_y = int(self.position_x//10), int(self.position_y//10)
-            for (sensed_y, sensed_x) in sensed_producer_cell_locations:
-                sensed_producer_cell = General.all_cells_matrix[sensed_y, sensed_x]
-                #print(f"{General.all_cells_matrix[sensed_y, sensed_x]} at : {sensed_x}, {sensed_y} ")
-                distance_to_producer_matrix = abs(corresponding_matrix_x - sensed_x) + abs(corresponding_matrix_y - sensed_y)
-                if distance_to_producer_matrix <= 2:
-                    pollen_to_be_dropped = np.random.choice(self.current_polen_list)
-                    self.drop_pollen(pollen_to_be_dropped, sensed_producer_cell.position_x, sensed_producer_cell.position_y)
-                    print(f"pollen dropped at {sensed_producer_cell.position_x}, {sensed_producer_cell.position_y}")
+        if self.current_polen_list:
+            for (sensed_y, sensed_x) in self.sense(General.cell_index, General.producer_type):
+                # cells are always on the corner of their grid cell
+                sensed_producer_position_x, sensed_producer_position_y = int(sensed_x*10), int(sensed_y*10)
+                # the carried pollen can run out before all the close producer cells are visited
+                if self.current_polen_list:
+                    pollen_to_be_dropped = Distributors.random.choice(self.current_polen_list)
+                    self.drop_pollen(pollen_to_be_dropped, sensed_producer_position_x, sensed_producer_position_y)
         # chance to drop a pollen in the environment randomly
-        if (self.current_polen_list) and (np.random.random() < round(self.max_speed/10, 4)):
-            pollen_to_be_dropped = np.random.choice(self.current_polen_list)
+        if (self.current_polen_list) and (Distributors.random.random() < round(self.max_speed/10, 4)):
+            pollen_to_be_dropped = Distributors.random.choice(self.current_polen_list)
             self.drop_pollen(pollen_to_be_dropped)
-            print(f"pollen dropped in the environment randomly at {self.position_x}, {self.position_y}")
-
-
-
-
-
-
-
-
-
-        #print(self.sensed_area_for_other_cells)
-        #print(self.sensed_area_for_utilities)
-        
-
-
-
 
 
+# every attribute stored in a column is read / written through the store
+for column_name in DistributorStore.columns:
+    setattr(Distributors, column_name, DistributorStore.column_property(column_name))
 
 if __name__ == "__main__":
     Distributors.generate_starting_distributor_cells(25000)
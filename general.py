@@ -1,4 +1,7 @@
 import numpy as np
+from map_store import MapStore, MapLayer
+from spatial_index import SpatialIndex
+from neighbourhood import Neighbourhood
 
 class General():
 
@@ -19,26 +22,136 @@ class General():
 
     total_grid_cells: int = (world_size//10)**2
 
-    area_1x1: list[tuple[int, int]] = [
-        (-10, -10), (-10, 0), (-10, 10),
-        (0, -10), (0, 10),
-        (10, -10), (10, 0), (10, 10)
-    ]
-
-    area_1x1: list[tuple[int, int]] = [(x, y) for x in range(-10, 20, 10) for y in range(-10, 20, 10)]
-    area_2x2: list[tuple[int, int]] = [(x, y) for x in range(-20, 30, 10) for y in range(-20, 30, 10)]
-    area_3x3: list[tuple[int, int]] = [(x, y) for x in range(-30, 40, 10) for y in range(-30, 40, 10)]
-    area_10x10: list[tuple[int, int]] = [(x, y) for x in range(-100, 110, 10) for y in range(-100, 110, 10)]
+    # the square areas of 1, 2 and 3 grid cells around a grid cell, see neighbourhood.py
+    neighbourhood_1x1 = Neighbourhood(1, world_size//10)
+    neighbourhood_2x2 = Neighbourhood(2, world_size//10)
+    neighbourhood_3x3 = Neighbourhood(3, world_size//10)
 
 
     # lists for the cells 
-    all_matrices = np.load("map_1234.npz")
-    elevation_matrix = all_matrices["elevation_smoothed_matrix"]
-    temperature_matrix = all_matrices["temperature_smoothed_matrix"]
-    humidity_matrix = all_matrices["humidity_smoothed_matrix"]
-    radioactivity_matrix = all_matrices["radioactivity_smoothed_matrix"]
-    productivity_matrix = all_matrices["productivity_smoothed_matrix"]
+    # the layers of the map are read from the map store upon the first access, see load_map()
+    default_map_seed: int = 1234
+    map_store: MapStore = None
+    elevation_matrix = MapLayer("elevation_smoothed_matrix")
+    temperature_matrix = MapLayer("temperature_smoothed_matrix")
+    humidity_matrix = MapLayer("humidity_smoothed_matrix")
+    radioactivity_matrix = MapLayer("radioactivity_smoothed_matrix")
+    productivity_matrix = MapLayer("productivity_smoothed_matrix")
 
     all_utility_matrix = np.empty((world_size//10, world_size//10), dtype=object)
     all_cells_matrix = np.empty((world_size//10, world_size//10), dtype=object)
 
+    # type codes of the objects in the matrices above, kept in sync by set_cell / set_utility
+    empty_type: int = 0
+    producer_type: int = 1
+    distributor_type: int = 2
+    food_type: int = 1
+    corpse_type: int = 2
+    pollen_type: int = 3
+    cell_type_matrix = np.zeros((world_size//10, world_size//10), dtype=np.uint8)
+    utility_type_matrix = np.zeros((world_size//10, world_size//10), dtype=np.uint8)
+    # slot of the cell in the store of its kind (-1 if empty), the type code tells which one
+    empty_slot: int = -1
+    cell_slot_matrix = np.full((world_size//10, world_size//10), empty_slot, dtype=np.int32)
+    # slot of the utility in Utility.store (-1 if empty)
+    utility_slot_matrix = np.full((world_size//10, world_size//10), empty_slot, dtype=np.int32)
+    # counts of the types per bucket of grid cells, for the neighbourhood queries (e.g. the pollen near a distributor cell)
+    cell_index = SpatialIndex(cell_type_matrix, 3)
+    utility_index = SpatialIndex(utility_type_matrix, 4)
+    # grid cells changed since the last time a renderer took them (births, deaths, moves, utilities spawned / expired / faded)
+    dirty_tile_matrix = np.zeros((world_size//10, world_size//10), dtype=bool)
+
+    @classmethod
+    def load_map(cls, path: str = None, seed: int = None) -> MapStore:
+        # chooses the map of the simulation, e.g. General.load_map(seed=42) for map_42.npz
+        # should be called before the cells are created, since they read their levels from the map
+        if path is None:
+            cls.map_store = MapStore.from_seed(cls.default_map_seed if seed is None else seed)
+        else:
+            cls.map_store = MapStore(path)
+        return cls.map_store
+
+    @classmethod
+    def get_map_store(cls) -> MapStore:
+        if cls.map_store is None:
+            cls.load_map()
+        return cls.map_store
+
+    @classmethod
+    def set_cell(cls, grid_y: int, grid_x: int, cell) -> None:
+        cls.all_cells_matrix[grid_y, grid_x] = cell
+        new_type: int = cell.type_code if cell is not None else cls.empty_type
+        cls.cell_index.update(grid_y, grid_x, cls.cell_type_matrix[grid_y, grid_x], new_type)
+        cls.cell_type_matrix[grid_y, grid_x] = new_type
+        cls.cell_slot_matrix[grid_y, grid_x] = cell.slot if cell is not None else cls.empty_slot
+        cls.dirty_tile_matrix[grid_y, grid_x] = True
+
+    @classmethod
+    def set_cells(cls, grid_ys: np.ndarray, grid_xs: np.ndarray, cells: list, type_code: int, slots: np.ndarray) -> None:
+        # batched set_cell for new cells of one type on distinct empty grid cells
+        cell_array = np.empty(len(cells), dtype=object)
+        cell_array[:] = cells
+        cls.all_cells_matrix[grid_ys, grid_xs] = cell_array
+        cls.cell_index.update_many(grid_ys, grid_xs, cls.cell_type_matrix[grid_ys, grid_xs], type_code)
+        cls.cell_type_matrix[grid_ys, grid_xs] = type_code
+        cls.cell_slot_matrix[grid_ys, grid_xs] = slots
+        cls.dirty_tile_matrix[grid_ys, grid_xs] = True
+
+    @classmethod
+    def clear_cells(cls, grid_ys: np.ndarray, grid_xs: np.ndarray) -> None:
+        # batched set_cell(grid_y, grid_x, None) for distinct grid cells
+        cls.all_cells_matrix[grid_ys, grid_xs] = None
+        cls.cell_index.update_many(grid_ys, grid_xs, cls.cell_type_matrix[grid_ys, grid_xs], cls.empty_type)
+        cls.cell_type_matrix[grid_ys, grid_xs] = cls.empty_type
+        cls.cell_slot_matrix[grid_ys, grid_xs] = cls.empty_slot
+        cls.dirty_tile_matrix[grid_ys, grid_xs] = True
+
+    @classmethod
+    def set_utility(cls, grid_y: int, grid_x: int, utility) -> None:
+        cls.all_utility_matrix[grid_y, grid_x] = utility
+        new_type: int = utility.type_code if utility is not None else cls.empty_type
+        cls.utility_index.update(grid_y, grid_x, cls.utility_type_matrix[grid_y, grid_x], new_type)
+        cls.utility_type_matrix[grid_y, grid_x] = new_type
+        cls.utility_slot_matrix[grid_y, grid_x] = utility.slot if utility is not None else cls.empty_slot
+        cls.dirty_tile_matrix[grid_y, grid_x] = True
+
+    @classmethod
+    def set_utilities(cls, grid_ys: np.ndarray, grid_xs: np.ndarray, utilities: list, type_code: int, slots: np.ndarray) -> None:
+        # batched set_utility for new utilities of one type on distinct grid cells, the utilities already there are replaced
+        utility_array = np.empty(len(utilities), dtype=object)
+        utility_array[:] = utilities
+        cls.all_utility_matrix[grid_ys, grid_xs] = utility_array
+        cls.utility_index.update_many(grid_ys, grid_xs, cls.utility_type_matrix[grid_ys, grid_xs], type_code)
+        cls.utility_type_matrix[grid_ys, grid_xs] = type_code
+        cls.utility_slot_matrix[grid_ys, grid_xs] = slots
+        cls.dirty_tile_matrix[grid_ys, grid_xs] = True
+
+    @classmethod
+    def clear_utilities(cls, grid_ys: np.ndarray, grid_xs: np.ndarray) -> None:
+        # batched set_utility(grid_y, grid_x, None) for distinct grid cells
+        cls.all_utility_matrix[grid_ys, grid_xs] = None
+        cls.utility_index.update_many(grid_ys, grid_xs, cls.utility_type_matrix[grid_ys, grid_xs], cls.empty_type)
+        cls.utility_type_matrix[grid_ys, grid_xs] = cls.empty_type
+        cls.utility_slot_matrix[grid_ys, grid_xs] = cls.empty_slot
+        cls.dirty_tile_matrix[grid_ys, grid_xs] = True
+
+    @classmethod
+    def clear_grids(cls) -> None:
+        # empties every grid of the cells and the utilities in place (the spatial indices keep referring to them)
+        cls.all_cells_matrix[:] = None
+        cls.all_utility_matrix[:] = None
+        cls.cell_type_matrix[:] = cls.empty_type
+        cls.utility_type_matrix[:] = cls.empty_type
+        cls.cell_slot_matrix[:] = cls.empty_slot
+        cls.utility_slot_matrix[:] = cls.empty_slot
+        cls.cell_index.rebuild()
+        cls.utility_index.rebuild()
+        cls.dirty_tile_matrix[:] = False
+
+    @classmethod
+    def take_dirty_tiles(cls) -> np.ndarray:
+        # the changed grid cells as [[y1, x1], [y2, x2], ...], they are clean afterwards
+        dirty_tiles = np.argwhere(cls.dirty_tile_matrix)
+        cls.dirty_tile_matrix[:] = False
+        return dirty_tiles
+
@@ -0,0 +1,387 @@
+
+# builds the map_*.npz files that General loads through General.load_map() and MapStore
+from opensimplex import OpenSimplex
+from scipy.signal import fftconvolve
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import os
+import random
+import sys
+import time
+
+# constants of the 2D OpenSimplex noise, the same ones the opensimplex package uses
+STRETCH_CONSTANT2: float = -0.211324865405187 # (1/sqrt(2+1)-1)/2
+SQUISH_CONSTANT2: float = 0.366025403784439 # (sqrt(2+1)-1)/2
+NORM_CONSTANT2: int = 47
+GRADIENTS2 = np.array([
+    5, 2, 2, 5,
+    -5, 2, -2, 5,
+    5, -2, 2, -5,
+    -5, -2, -2, -5,
+], dtype=np.float64)
+
+def extrapolate2(perm: np.ndarray, xsb: np.ndarray, ysb: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    index = perm[(perm[xsb & 0xFF] + ysb) & 0xFF] & 0x0E
+    return GRADIENTS2[index]*dx + GRADIENTS2[index+1]*dy
+
+def add_contribution(value: np.ndarray, perm: np.ndarray, xsb: np.ndarray, ysb: np.ndarray, dx: np.ndarray, dy: np.ndarray) -> np.ndarray:
+    # the vertices outside of the attenuation radius add nothing
+    attn = 2 - dx*dx - dy*dy
+    inside_radius = attn > 0
+    attn *= attn
+    return value + np.where(inside_radius, attn*attn*extrapolate2(perm, xsb, ysb, dx, dy), 0.0)
+
+def noise2_grid(perm: np.ndarray, x: np.ndarray, y: np.ndarray) -> np.ndarray:
+    # OpenSimplex.noise2 evaluated on every (y, x) pair at once, shape (len(y), len(x))
+    # the scalar code of the opensimplex package with its branches turned into masks,
+    # so that the values are exactly the same as the ones of noise2
+    x, y = np.meshgrid(x, y)
+    stretch_offset = (x + y)*STRETCH_CONSTANT2
+    xs = x + stretch_offset
+    ys = y + stretch_offset
+    xsb = np.floor(xs)
+    ysb = np.floor(ys)
+    squish_offset = (xsb + ysb)*SQUISH_CONSTANT2
+    dx0 = x - (xsb + squish_offset)
+    dy0 = y - (ysb + squish_offset)
+    xins = xs - xsb
+    yins = ys - ysb
+    in_sum = xins + yins
+    xsb = xsb.astype(np.int64)
+    ysb = ysb.astype(np.int64)
+
+    # contribution (1, 0) and (0, 1)
+    value = np.zeros_like(x)
+    value = add_contribution(value, perm, xsb + 1, ysb, dx0 - 1 - SQUISH_CONSTANT2, dy0 - 0 - SQUISH_CONSTANT2)
+    value = add_contribution(value, perm, xsb, ysb + 1, dx0 - 0 - SQUISH_CONSTANT2, dy0 - 1 - SQUISH_CONSTANT2)
+
+    # the extra vertex depends on the triangle the point is in
+    inside = in_sum <= 1 # triangle at (0, 0), else at (1, 1)
+    zins = np.where(inside, 1 - in_sum, 2 - in_sum)
+    x_closer = xins > yins
+    inside_corner = inside & ((zins > xins) | (zins > yins))
+    inside_edge = inside & ~inside_corner
+    outside_corner = ~inside & ((zins < xins) | (zins < yins))
+    outside_edge = ~inside & ~outside_corner
+    branches = [inside_corner & x_closer, inside_corner & ~x_closer, inside_edge,
+                outside_corner & x_closer, outside_corner & ~x_closer, outside_edge]
+    xsv_ext = np.select(branches, [xsb + 1, xsb - 1, xsb + 1, xsb + 2, xsb, xsb])
+    ysv_ext = np.select(branches, [ysb - 1, ysb + 1, ysb + 1, ysb, ysb + 2, ysb])
+    dx_ext = np.select(branches, [dx0 - 1, dx0 + 1, dx0 - 1 - 2*SQUISH_CONSTANT2,
+                                  dx0 - 2 - 2*SQUISH_CONSTANT2, dx0 + 0 - 2*SQUISH_CONSTANT2, dx0])
+    dy_ext = np.select(branches, [dy0 + 1, dy0 - 1, dy0 - 1 - 2*SQUISH_CONSTANT2,
+                                  dy0 + 0 - 2*SQUISH_CONSTANT2, dy0 - 2 - 2*SQUISH_CONSTANT2, dy0])
+
+    # contribution (0, 0) or (1, 1)
+    xsb = np.where(inside, xsb, xsb + 1)
+    ysb = np.where(inside, ysb, ysb + 1)
+    dx0 = np.where(inside, dx0, dx0 - 1 - 2*SQUISH_CONSTANT2)
+    dy0 = np.where(inside, dy0, dy0 - 1 - 2*SQUISH_CONSTANT2)
+    value = add_contribution(value, perm, xsb, ysb, dx0, dy0)
+    value = add_contribution(value, perm, xsv_ext, ysv_ext, dx_ext, dy_ext)
+
+    return value / NORM_CONSTANT2
+
+class MapGenerator():
+
+    # rows of the map evaluated at once, so that the temporary arrays stay small
+    chunk_rows: int = 250
+    # (shape, kernel) -> the normalization of the smoothing at the borders
+    normalization_cache: dict[tuple, np.ndarray] = {}
+
+    def __init__(self, seed: int = 1, world_size: int = 2500):
+        self.world_size: int = world_size
+        # every layer has its own seed derived from the world seed, so that the worlds of consecutive seeds share no noise
+        elevation_seed, temperature_seed, humidity_seed, productivity_seed = np.random.SeedSequence(seed).generate_state(4).tolist()
+        self.noise_elev = OpenSimplex(seed=elevation_seed)
+        self.noise_temp = OpenSimplex(seed=temperature_seed)
+        self.noise_hum = OpenSimplex(seed=humidity_seed)
+        self.noise_prod = OpenSimplex(seed=productivity_seed)
+        self.noise_scale: float = 0.02
+        self.random = random.Random(seed)
+
+        self.square_kernel = np.ones((21, 21))
+        # create the circle kernel
+        self.circle_kernel = np.zeros((2*5+1, 2*5+1)) # 2*radius+1
+        y, x = np.ogrid[-5:6, -5:6]
+        distance = np.sqrt(x**2+y**2)
+        self.circle_kernel[distance<=5]=1
+        self.circle_kernel/=np.sum(self.circle_kernel)
+
+    def fractal_noise(self, noise: OpenSimplex, noise_scale: float, row_start: int = 0, row_end: int = None) -> np.ndarray:
+        # 3 octaves of the noise over the rows of the map: 1*n(f) + 0.5*n(2f) + 0.25*n(4f)
+        # the opensimplex package only has a compiled noise2array with numba, so the grid version is used
+        if row_end is None: row_end = self.world_size
+        perm = noise._perm
+        coordinates = np.arange(self.world_size, dtype=np.float64)
+        octaves = np.empty((3, row_end-row_start, self.world_size))
+        for row in range(row_start, row_end, self.chunk_rows):
+            rows = coordinates[row:min(row+self.chunk_rows, row_end)]
+            for octave, frequency in enumerate((1, 2, 4)):
+                octaves[octave, row-row_start:row-row_start+len(rows)] = noise2_grid(perm, coordinates*noise_scale*frequency, rows*noise_scale*frequency)
+        return octaves
+
+    def smooth(self, matrix: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        # average over the kernel, the borders are divided by the amount of the cells inside the map
+        return self.convolve(matrix, kernel) / self.normalization(matrix.shape, kernel)
+
+    def smooth_rows(self, matrix: np.ndarray, kernel: np.ndarray, row_start: int, row_end: int) -> np.ndarray:
+        # the rows [row_start, row_end) of smooth(matrix, kernel), only the rows within the reach of the kernel are used
+        halo: int = kernel.shape[0]//2
+        block_start, block_end = max(0, row_start-halo), min(matrix.shape[0], row_end+halo)
+        block_sum = self.convolve(matrix[block_start:block_end], kernel)[row_start-block_start:row_end-block_start]
+        return block_sum / self.normalization(matrix.shape, kernel)[row_start:row_end]
+
+    def normalization(self, shape: tuple[int, int], kernel: np.ndarray) -> np.ndarray:
+        # the kernel summed over the cells inside the map, the same for every layer with the same shape and kernel
+        key = (shape, kernel.shape, kernel.tobytes())
+        if key not in MapGenerator.normalization_cache:
+            MapGenerator.normalization_cache[key] = self.convolve(np.ones(shape), kernel)
+        return MapGenerator.normalization_cache[key]
+
+    @staticmethod
+    def convolve(matrix: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        # same result as convolve2d(matrix, kernel, mode="same", boundary="fill")
+        if (kernel == kernel.flat[0]).all() and (kernel.shape[0] % 2) and (kernel.shape[1] % 2):
+            # a box is separable: a running sum along the rows, then along the columns
+            return MapGenerator.box_sum(MapGenerator.box_sum(matrix, kernel.shape[0]//2, 0), kernel.shape[1]//2, 1) * kernel.flat[0]
+        if (kernel.shape[0] % 2) and (kernel.shape[1] % 2) and (np.count_nonzero(matrix)*kernel.size < matrix.size):
+            # a few points (e.g. the radioactive sources), the kernel is added around each of them
+            return MapGenerator.scatter_kernel(matrix, kernel)
+        return fftconvolve(matrix, kernel, mode="same")
+
+    @staticmethod
+    def scatter_kernel(matrix: np.ndarray, kernel: np.ndarray) -> np.ndarray:
+        result = np.zeros(matrix.shape)
+        point_ys, point_xs = np.nonzero(matrix)
+        point_values = matrix[point_ys, point_xs]
+        center_y, center_x = kernel.shape[0]//2, kernel.shape[1]//2
+        for kernel_y, kernel_x in np.argwhere(kernel):
+            target_ys, target_xs = point_ys + kernel_y - center_y, point_xs + kernel_x - center_x
+            inside_map = (target_ys >= 0) & (target_ys < matrix.shape[0]) & (target_xs >= 0) & (target_xs < matrix.shape[1])
+            np.add.at(result, (target_ys[inside_map], target_xs[inside_map]), point_values[inside_map]*kernel[kernel_y, kernel_x])
+        return result
+
+    @staticmethod
+    def box_sum(matrix: np.ndarray, radius: int, axis: int) -> np.ndarray:
+        # sum of the 2*radius+1 values around each value along the axis, the values outside of the map are 0
+        # out[i] = cumulative[i+radius] - cumulative[i-radius-1], clipped at both ends
+        cumulative = np.cumsum(matrix, axis=axis)
+        box = np.empty_like(cumulative)
+        cumulative_view, box_view = np.swapaxes(cumulative, 0, axis), np.swapaxes(box, 0, axis)
+        length: int = cumulative_view.shape[0]
+        box_view[:length-radius] = cumulative_view[radius:]
+        box_view[length-radius:] = cumulative_view[-1]
+        box_view[radius+1:] -= cumulative_view[:length-radius-1]
+        return box
+
+    # the layers are the vectorized versions of Visual.get_elevation, get_temperature, ...
+    # they can be calculated for a stripe of rows, starting at row_start, then the given matrices are the same stripe
+    def elevation_layer(self, row_start: int = 0, row_end: int = None) -> np.ndarray:
+        octaves = self.fractal_noise(self.noise_elev, self.noise_scale, row_start, row_end)
+        e = 1*octaves[0]
+        e += 0.5*octaves[1]
+        e += 0.25*octaves[2]
+        return (e + 1) / 2
+
+    def temperature_layer(self, elevation_matrix: np.ndarray, row_start: int = 0) -> np.ndarray:
+        base_temp = (1.0 - 2*elevation_matrix) * 0.7
+        octaves = self.fractal_noise(self.noise_temp, 0.05, row_start, row_start+elevation_matrix.shape[0])
+        noise = (1.0*octaves[0] + 0.5*octaves[1] + 0.25*octaves[2]) / 1.75
+        noise *= 0.3
+        temperature = base_temp + noise
+        # adjust temperature for lakes
+        temperature = np.where(elevation_matrix <= 0.2, temperature + elevation_matrix*0.2, temperature)
+        return np.clip(temperature, -1.0, 1.0)
+
+    def humidity_layer(self, elevation_matrix: np.ndarray, row_start: int = 0) -> np.ndarray:
+        base_hum = (1.0 - elevation_matrix)*0.9
+        octaves = self.fractal_noise(self.noise_hum, 0.05, row_start, row_start+elevation_matrix.shape[0])
+        noise = (1.0*octaves[0] + 0.5*octaves[1] + 0.25*octaves[2])/1.75
+        noise *= 0.10
+        return np.clip(base_hum + noise, 0, 1.0)
+
+    def radioactivity_layer(self, zone_count: int = 4) -> np.ndarray:
+        # same sources and drains as Visual.get_radioactivity, drawn from the own random generator
+        world_size: int = self.world_size
+        rng = self.random
+        radioactivity_matrix = np.zeros((world_size, world_size))
+        all_source_positions: set[tuple[int, int]] = set()
+        all_drain_positions: set[tuple[int, int]] = set()
+        drains: list[tuple[int, int, float]] = []
+        for _ in range(zone_count):
+            source_x = rng.randint(0, world_size-1)
+            source_y = rng.randint(0, world_size-1)
+            while (source_x, source_y) in all_source_positions:
+                source_x = rng.randint(0, world_size-1)
+                source_y = rng.randint(0, world_size-1)
+            all_source_positions.add((source_y, source_x))
+            for _ in range(500):
+                drain_x_position = max(min(source_x - rng.randint(-25, 25), world_size-1), 0)
+                drain_y_position = max(min(source_y - rng.randint(-25, 25), world_size-1), 0)
+                drain_value = 1 - rng.uniform(0, 0.5)
+                while (drain_x_position, drain_y_position) in all_drain_positions:
+                    drain_x_position = max(min(source_x - rng.randint(-25, 25), world_size-1), 0)
+                    drain_y_position = max(min(source_y - rng.randint(-25, 25), world_size-1), 0)
+                all_drain_positions.add((drain_y_position, drain_x_position))
+                drains.append((drain_y_position, drain_x_position, drain_value))
+        for source_y, source_x in all_source_positions:
+            radioactivity_matrix[source_y, source_x] = 1
+        for drain_y, drain_x, drain_value in drains:
+            radioactivity_matrix[drain_y, drain_x] = drain_value
+        return self.smooth(radioactivity_matrix, self.circle_kernel)*10
+
+    def productivity_layer(self, humidity_matrix: np.ndarray, radioactivity_smoothed_matrix: np.ndarray, row_start: int = 0) -> np.ndarray:
+        octaves = self.fractal_noise(self.noise_prod, self.noise_scale, row_start, row_start+humidity_matrix.shape[0])
+        productivity = 1*octaves[0]
+        productivity += 0.5*octaves[1]
+        productivity += 0.25*octaves[2]
+        productivity = (productivity + 1) * humidity_matrix
+        productivity = np.where(radioactivity_smoothed_matrix > 0.3, productivity * (radioactivity_smoothed_matrix * 2), productivity)
+        productivity = np.where(radioactivity_smoothed_matrix > 0.7, 1.0, productivity)
+        return productivity
+
+    def generate(self) -> dict[str, np.ndarray]:
+        # the five layers under the names General loads them with
+        elevation_matrix = self.elevation_layer()
+        humidity_matrix = self.humidity_layer(elevation_matrix)
+        radioactivity_smoothed_matrix = self.radioactivity_layer()
+        return {
+            "elevation_smoothed_matrix": self.smooth(elevation_matrix, self.square_kernel),
+            "temperature_smoothed_matrix": self.smooth(self.temperature_layer(elevation_matrix), self.square_kernel),
+            "humidity_smoothed_matrix": self.smooth(humidity_matrix, self.square_kernel),
+            "radioactivity_smoothed_matrix": radioactivity_smoothed_matrix,
+            "productivity_smoothed_matrix": self.smooth(self.productivity_layer(humidity_matrix, radioactivity_smoothed_matrix), self.square_kernel),
+        }
+
+    def save(self, path: str) -> None:
+        np.savez(path, **self.generate())
+
+def build_world_part(shared_memory_name: str, seed: int, world_size: int, layer: str, row_start: int, row_end: int) -> None:
+    # one task of the WorldBuilder, run in a worker process: the rows of one layer of one world
+    # the inputs are read from and the result is written into the shared memory of the world
+    shared_memory = SharedMemory(name=shared_memory_name)
+    layers = WorldBuilder.layer_views(shared_memory.buf, world_size)
+    try:
+        map_generator = MapGenerator(seed, world_size)
+        rows = slice(row_start, row_end)
+        if layer == "elevation":
+            layers[layer][rows] = map_generator.elevation_layer(row_start, row_end)
+        elif layer == "temperature":
+            layers[layer][rows] = map_generator.temperature_layer(layers["elevation"][rows], row_start)
+        elif layer == "humidity":
+            layers[layer][rows] = map_generator.humidity_layer(layers["elevation"][rows], row_start)
+        elif layer == "radioactivity":
+            layers[layer][:] = map_generator.radioactivity_layer()
+        elif layer == "productivity":
+            layers[layer][rows] = map_generator.productivity_layer(layers["humidity"][rows], layers["radioactivity"][rows], row_start)
+        else: # smoothing of a layer
+            layers[layer][rows] = map_generator.smooth_rows(layers[WorldBuilder.layer_dependencies[layer][0]], map_generator.square_kernel, row_start, row_end)
+    finally:
+        layers.clear() # the views should be gone before the shared memory is closed
+        shared_memory.close()
+
+class WorldBuilder():
+
+    # the layers of a world and the layers they are calculated from
+    # the ones without a dependency between each other are calculated at the same time
+    layer_dependencies: dict[str, tuple[str, ...]] = {
+        "elevation": (),
+        "radioactivity": (), # smoothed upon creation
+        "temperature": ("elevation",),
+        "humidity": ("elevation",),
+        "productivity": ("humidity", "radioactivity"),
+        "elevation_smoothed": ("elevation",),
+        "temperature_smoothed": ("temperature",),
+        "humidity_smoothed": ("humidity",),
+        "productivity_smoothed": ("productivity",),
+    }
+    # name in the map file -> layer
+    saved_layers: dict[str, str] = {
+        "elevation_smoothed_matrix": "elevation_smoothed",
+        "temperature_smoothed_matrix": "temperature_smoothed",
+        "humidity_smoothed_matrix": "humidity_smoothed",
+        "radioactivity_smoothed_matrix": "radioactivity",
+        "productivity_smoothed_matrix": "productivity_smoothed",
+    }
+
+    def __init__(self, world_size: int = 2500, stripe_rows: int = 250, max_workers: int = None, worlds_in_flight: int = 2):
+        self.world_size: int = world_size
+        # every layer is split into horizontal stripes, each one is a task
+        self.stripe_rows: int = stripe_rows
+        self.max_workers: int = max_workers or os.cpu_count()
+        # every world in flight holds all of its layers in shared memory
+        self.worlds_in_flight: int = worlds_in_flight
+
+    @classmethod
+    def layer_views(cls, buffer, world_size: int) -> dict[str, np.ndarray]:
+        # the layers of a world one after another in a single buffer
+        layer_size: int = world_size*world_size
+        return {layer: np.ndarray((world_size, world_size), dtype=np.float64, buffer=buffer, offset=i*layer_size*8)
+                for i, layer in enumerate(cls.layer_dependencies)}
+
+    def stripes(self, layer: str) -> list[tuple[int, int]]:
+        if layer == "radioactivity": # the sources are drawn one after another
+            return [(0, self.world_size)]
+        return [(row, min(row+self.stripe_rows, self.world_size)) for row in range(0, self.world_size, self.stripe_rows)]
+
+    def build(self, seeds: list[int], directory: str = ".") -> list[str]:
+        # creates map_<seed>.npz for every seed, returns the paths
+        paths: list[str] = []
+        pending_seeds: list[int] = list(seeds)
+        # seed -> [shared memory, layers done, layers submitted, remaining stripes of each submitted layer]
+        worlds: dict[int, list] = {}
+        running: dict = {}
+        try:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                while pending_seeds or worlds:
+                    while pending_seeds and (len(worlds) < self.worlds_in_flight):
+                        seed = pending_seeds.pop(0)
+                        shared_memory = SharedMemory(create=True, size=len(self.layer_dependencies)*self.world_size*self.world_size*8)
+                        worlds[seed] = [shared_memory, set(), set(), {}]
+                    # submit every layer of which the dependencies are done
+                    for seed, (shared_memory, done_layers, submitted_layers, remaining_stripes) in worlds.items():
+                        for layer, dependencies in self.layer_dependencies.items():
+                            if (layer not in submitted_layers) and all(dependency in done_layers for dependency in dependencies):
+                                submitted_layers.add(layer)
+                                remaining_stripes[layer] = len(self.stripes(layer))
+                                for row_start, row_end in self.stripes(layer):
+                                    future = executor.submit(build_world_part, shared_memory.name, seed, self.world_size, layer, row_start, row_end)
+                                    running[future] = (seed, layer)
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        seed, layer = running.pop(future)
+                        future.result() # raises the exception of the worker, if there is one
+                        world = worlds[seed]
+                        world[3][layer] -= 1
+                        if not(world[3][layer]):
+                            world[1].add(layer)
+                        if len(world[1]) == len(self.layer_dependencies):
+                            paths.append(self.save_world(seed, world[0], directory))
+                            del worlds[seed]
+        finally:
+            # the worlds left unfinished by an error
+            for shared_memory, *_ in worlds.values():
+                shared_memory.close()
+                shared_memory.unlink()
+        return paths
+
+    def save_world(self, seed: int, shared_memory: SharedMemory, directory: str) -> str:
+        path: str = os.path.join(directory, f"map_{seed}.npz")
+        layers = self.layer_views(shared_memory.buf, self.world_size)
+        np.savez(path, **{name: layers[layer] for name, layer in self.saved_layers.items()})
+        del layers
+        shared_memory.close()
+        shared_memory.unlink()
+        return path
+
+# e.g. "python map_generator.py 1234" creates map_1234.npz
+# and "python map_generator.py 1 50" creates map_1.npz ... map_50.npz with all the cores
+if __name__ == "__main__":
+    first_seed = int(sys.argv[1]) if len(sys.argv) > 1 else 1234
+    world_count = int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    start_time = time.perf_counter()
+    created_paths = WorldBuilder().build(list(range(first_seed, first_seed+world_count)))
+    print(f"{', '.join(created_paths)} created in {time.perf_counter() - start_time:.1f} seconds")
+    sys.exit()
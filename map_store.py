@@ -0,0 +1,56 @@
+
+# read-only access to the layers of a map file, without loading the whole map into memory
+import numpy as np
+import os
+import zipfile
+
+class MapStore():
+
+    def __init__(self, path: str):
+        # path of a map_<seed>.npz file (as written by np.savez / map_generator.py)
+        # or of a directory with one <layer name>.npy file per layer
+        self.path: str = path
+        self.layers: dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_seed(cls, seed: int, directory: str = ".") -> "MapStore":
+        return cls(os.path.join(directory, f"map_{seed}.npz"))
+
+    def layer(self, name: str) -> np.ndarray:
+        # the layer is mapped upon the first access, then the same array is given back
+        # the arrays are copy-on-write: the simulation can change them (e.g. the seasonal temperature), the file stays the same
+        if name not in self.layers:
+            if os.path.isdir(self.path):
+                self.layers[name] = np.load(os.path.join(self.path, f"{name}.npy"), mmap_mode="c")
+            else:
+                self.layers[name] = self.map_npz_member(name)
+        return self.layers[name]
+
+    def map_npz_member(self, name: str) -> np.ndarray:
+        with zipfile.ZipFile(self.path) as archive:
+            member = archive.getinfo(f"{name}.npy")
+            if member.compress_type != zipfile.ZIP_STORED:
+                # a compressed map (np.savez_compressed) can not be mapped, it is read as a whole
+                with archive.open(member) as member_file:
+                    return np.lib.format.read_array(member_file)
+        with open(self.path, "rb") as map_file:
+            # the data of a stored member starts after its local header: 30 bytes + the file name + the extra field
+            map_file.seek(member.header_offset + 26)
+            name_length, extra_length = np.frombuffer(map_file.read(4), dtype="<u2")
+            map_file.seek(member.header_offset + 30 + int(name_length) + int(extra_length))
+            version = np.lib.format.read_magic(map_file)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(map_file)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(map_file)
+            offset: int = map_file.tell()
+        return np.memmap(self.path, dtype=dtype, mode="c", offset=offset, shape=shape, order="F" if fortran_order else "C")
+
+class MapLayer():
+
+    # class attribute, that gives a layer of the map store of its class, e.g. General.elevation_matrix
+    def __init__(self, name: str):
+        self.name: str = name
+
+    def __get__(self, instance, owner) -> np.ndarray:
+        return owner.get_map_store().layer(self.name)
@@ -0,0 +1,81 @@
+
+# the square areas around grid cells (General.neighbourhood_1x1, _2x2, _3x3) as arrays of grid index offsets
+import numpy as np
+from random_streams import RandomStream
+
+class Neighbourhood():
+
+    # the grid cells within radius of a grid cell, the offsets are in the order of the rows like np.argwhere
+    # which offsets leave the world is computed once for every row and column, so a query does no bounds checks
+    def __init__(self, radius: int, grid_size: int):
+        self.radius: int = radius
+        self.grid_size: int = grid_size
+        offset_ys, offset_xs = np.meshgrid(np.arange(-radius, radius+1), np.arange(-radius, radius+1), indexing="ij")
+        self.offset_ys: np.ndarray = offset_ys.ravel()
+        self.offset_xs: np.ndarray = offset_xs.ravel()
+        # the offsets as flat indices of a grid (row*grid_size + column)
+        self.flat_offsets: np.ndarray = self.offset_ys*grid_size + self.offset_xs
+        # inside_ys[grid_y, k] is True if the row grid_y+offset_ys[k] is in the world, the same for the columns
+        coordinates = np.arange(grid_size)[:, None]
+        self.inside_ys: np.ndarray = (coordinates+self.offset_ys >= 0) & (coordinates+self.offset_ys < grid_size)
+        self.inside_xs: np.ndarray = (coordinates+self.offset_xs >= 0) & (coordinates+self.offset_xs < grid_size)
+        # first and last+1 row / column of the area around a row / column, clipped at the borders
+        self.lows: list[int] = [max(0, coordinate-radius) for coordinate in range(grid_size)]
+        self.highs: list[int] = [min(grid_size, coordinate+radius+1) for coordinate in range(grid_size)]
+
+    def cells(self, grid_ys: np.ndarray, grid_xs: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # the grid cells around every given grid cell as (n, k) flat indices, and whether they are in the world
+        # the cells out of the world are clipped into it, so the indices can be used with np.take on any grid
+        inside = self.inside_ys[grid_ys] & self.inside_xs[grid_xs]
+        neighbours = np.clip((grid_ys*self.grid_size + grid_xs)[:, None] + self.flat_offsets, 0, self.grid_size*self.grid_size-1)
+        return neighbours, inside
+
+    def free(self, grid_ys: np.ndarray, grid_xs: np.ndarray, *type_matrices: np.ndarray, empty_type: int = 0) -> tuple[np.ndarray, np.ndarray]:
+        # like cells(), the mask tells the cells that are in the world and empty in all the type matrices
+        neighbours, free = self.cells(grid_ys, grid_xs)
+        for type_matrix in type_matrices:
+            free &= np.take(type_matrix, neighbours) == empty_type
+        return neighbours, free
+
+    def free_around(self, grid_y: int, grid_x: int, *type_matrices: np.ndarray, empty_type: int = 0) -> np.ndarray:
+        # the free grid cells around a single grid cell as [[y1, x1], [y2, x2], ...]
+        # for a single cell a view of the area is cheaper than the offsets, its clipped borders are looked up
+        low_y, high_y, low_x, high_x = self.lows[grid_y], self.highs[grid_y], self.lows[grid_x], self.highs[grid_x]
+        free = None
+        for type_matrix in type_matrices:
+            empty = type_matrix[low_y:high_y, low_x:high_x] == empty_type
+            free = empty if free is None else free & empty
+        return np.argwhere(free) + (low_y, low_x)
+
+    def pick_free(self, grid_ys: np.ndarray, grid_xs: np.ndarray, random_keys: np.ndarray, *type_matrices: np.ndarray,
+                  empty_type: int = 0) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # a random free grid cell around every given grid cell, the largest of its (n, k) random keys among the free ones
+        # a grid cell chosen more than once is given only to the first of the cells, the others get found=False
+        neighbours, free = self.free(grid_ys, grid_xs, *type_matrices, empty_type=empty_type)
+        choices = np.argmax(np.where(free, random_keys, -1.0), axis=1)
+        rows = np.arange(len(grid_ys))
+        chosen = neighbours[rows, choices]
+        found = free[rows, choices]
+        found_indices = np.flatnonzero(found)
+        _, first_indices = np.unique(chosen[found_indices], return_index=True)
+        found[found_indices] = False
+        found[found_indices[first_indices]] = True
+        return chosen//self.grid_size, chosen%self.grid_size, found
+
+    def place(self, grid_ys: np.ndarray, grid_xs: np.ndarray, random: RandomStream, occupied: np.ndarray, taken_type: int,
+              *type_matrices: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # a distinct free grid cell around every given grid cell as (rows, columns), -1 for the ones without a free grid cell left
+        # the ones that lose their choice to an earlier one choose again among the rest, in rounds of pick_free()
+        # occupied is a type matrix of its own (e.g. a copy), the chosen grid cells are marked in it with taken_type
+        chosen_ys = np.full(len(grid_ys), -1, dtype=np.int64)
+        chosen_xs = np.full(len(grid_ys), -1, dtype=np.int64)
+        waiting = np.arange(len(grid_ys))
+        while len(waiting):
+            random_keys = random.random_array((len(waiting), len(self.offset_ys)))
+            round_ys, round_xs, found = self.pick_free(grid_ys[waiting], grid_xs[waiting], random_keys, occupied, *type_matrices)
+            if not(found.any()): break # the rest have no free grid cell around them
+            placed = waiting[found]
+            chosen_ys[placed], chosen_xs[placed] = round_ys[found], round_xs[found]
+            occupied[round_ys[found], round_xs[found]] = taken_type
+            waiting = waiting[~found]
+        return chosen_ys, chosen_xs
@@ -0,0 +1,184 @@
+
+import numpy as np
+
+class ColumnStore():
+
+    # one numpy column per attribute of an entity, indexed by the slot of the entity
+    # the subclasses only define their columns, a (dtype, width) column holds a fixed-width row per slot
+    columns: dict[str, type] = {}
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity: int = capacity
+        for name, dtype in self.columns.items():
+            if isinstance(dtype, tuple):
+                setattr(self, name, np.zeros((capacity, dtype[1]), dtype=dtype[0]))
+            else:
+                setattr(self, name, np.zeros(capacity, dtype=dtype))
+        self.color = np.zeros((capacity, 3), dtype=np.uint8)
+        # free-slot bitmap, True if the slot holds a living entity
+        self.alive = np.zeros(capacity, dtype=bool)
+        # view object of each slot, for the code that still works on single entities
+        self.views: list = [None]*capacity
+        # stack of the released slots, so that allocation is O(1)
+        self.free_slots: list[int] = list(range(capacity-1, -1, -1))
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.alive))
+
+    def grow(self) -> None:
+        new_capacity: int = self.capacity*2
+        for name in list(self.columns) + ["color", "alive"]:
+            old_column = getattr(self, name)
+            new_column = np.zeros((new_capacity,) + old_column.shape[1:], dtype=old_column.dtype)
+            new_column[:self.capacity] = old_column
+            setattr(self, name, new_column)
+        self.views.extend([None]*(new_capacity-self.capacity))
+        self.free_slots.extend(range(new_capacity-1, self.capacity-1, -1))
+        self.capacity = new_capacity
+
+    def allocate(self, view = None) -> int:
+        if not(self.free_slots):
+            self.grow()
+        slot: int = self.free_slots.pop()
+        self.alive[slot] = True
+        self.views[slot] = view
+        return slot
+
+    def allocate_many(self, views: list) -> np.ndarray:
+        # slots for all the views at once, the same slots as allocate() one by one
+        count: int = len(views)
+        while len(self.free_slots) < count:
+            self.grow()
+        slots = self.free_slots[len(self.free_slots)-count:][::-1]
+        del self.free_slots[len(self.free_slots)-count:]
+        for slot, view in zip(slots, views):
+            self.views[slot] = view
+        slots = np.array(slots, dtype=np.int64)
+        self.alive[slots] = True
+        return slots
+
+    def release(self, slot: int) -> None:
+        self.alive[slot] = False
+        self.views[slot] = None
+        self.free_slots.append(slot)
+
+    def release_many(self, slots: np.ndarray) -> None:
+        self.alive[slots] = False
+        slot_list: list[int] = slots.tolist()
+        for slot in slot_list:
+            self.views[slot] = None
+        self.free_slots.extend(slot_list)
+
+    def active_slots(self) -> np.ndarray:
+        return np.flatnonzero(self.alive)
+
+    def get_state(self) -> dict[str, np.ndarray]:
+        # the arrays of the store for a checkpoint (see checkpoint.py), the views are made again by their owner
+        state: dict[str, np.ndarray] = {name: getattr(self, name) for name in list(self.columns) + ["color", "alive"]}
+        state["free_slots"] = np.array(self.free_slots, dtype=np.int64)
+        return state
+
+    def set_state(self, state: dict[str, np.ndarray]) -> None:
+        # the arrays are used as they are (e.g. mapped from the checkpoint file), the views are set by the owner
+        for name in list(self.columns) + ["color", "alive"]:
+            setattr(self, name, state[name])
+        self.capacity = len(state["alive"])
+        self.views = [None]*self.capacity
+        self.free_slots = state["free_slots"].tolist()
+
+    @staticmethod
+    def column_property(name: str) -> property:
+        # attribute of the view object, that reads / writes the column of the store instead of the instance dict
+        def getter(view):
+            return getattr(type(view).store, name).item(view.slot)
+        def setter(view, value) -> None:
+            getattr(type(view).store, name)[view.slot] = value
+        return property(getter, setter)
+
+class ProducerStore(ColumnStore):
+
+    columns: dict[str, type] = {
+        "position_x": np.int64,
+        "position_y": np.int64,
+        "energy_capacity": np.float64,
+        "energy_production_rate": np.float64,
+        "resilience": np.float64,
+        "lifespan": np.float64,
+        "aging_speed": np.float64,
+        "reproduction_rate": np.float64,
+        "offspring_count": np.int64,
+        "evolution_rate": np.float64,
+        "current_energy": np.float64,
+        "age": np.float64,
+        "pollen_production_rate": np.float64,
+        "ideal_pollen_production_temperature": np.float64,
+        "temperature_level": np.float64,
+        "elevation_level": np.float64,
+        "humidity_level": np.float64,
+        "radioactivity_level": np.float64,
+        "productivity_level": np.float64,
+        "energy_consumption_rate": np.float64,
+        "psychological_stress": np.float64,
+        "panic_mode": np.int64,
+    }
+
+class UtilityPool(ColumnStore):
+
+    # foods, corpses and pollen share the pool, the type_code column tells them apart
+    columns: dict[str, type] = {
+        "position_x": np.int64,
+        "position_y": np.int64,
+        "type_code": np.uint8,
+        "prolificacy": np.float64,
+        "decomposition_rate": np.float64,
+        # False while the utility is not on the map (e.g. a carried pollen), then it does not decompose
+        "on_ground": bool,
+        # only for the pollen: slot of the distributor cell that dropped it last (-1 if none)
+        "dropped_by": np.int64,
+        # only for the pollen: the traits of Producers.trait_schema it carries, in the order of the schema
+        "genome": (np.float32, 10),
+    }
+
+class DistributorStore(ColumnStore):
+
+    # the carried pollen of a distributor cell are a list of the view, the rest is here
+    columns: dict[str, type] = {
+        "position_x": np.int64,
+        "position_y": np.int64,
+        "energy_capacity": np.float64,
+        "energy_production_rate": np.float64,
+        "resilience": np.float64,
+        "lifespan": np.float64,
+        "aging_speed": np.float64,
+        "reproduction_rate": np.float64,
+        "offspring_count": np.int64,
+        "evolution_rate": np.float64,
+        "current_energy": np.float64,
+        "age": np.float64,
+        "temperature_level": np.float64,
+        "grid_x": np.int64,
+        "grid_y": np.int64,
+        "max_speed": np.float64,
+        "max_pollen_carry_amount": np.int64,
+        "polen_detection_range": np.int64,
+        "energy_consumption_rate": np.float64,
+        "psychological_stress": np.float64,
+    }
+
+def vectorized_round(values: np.ndarray, ndigits: int = 4) -> np.ndarray:
+    # same result as the builtin round(value, ndigits) for every element, unlike np.round
+    # which can break the ties differently because of the error of the scaling.
+    # the exact error of values*scale is found with the dekker product, so that the
+    # halfway cases are decided like python does: on the exact binary value
+    scale: float = 10.0**ndigits
+    scaled = values*scale
+    splitter: float = 134217729.0 # 2**27 + 1
+    values_split = splitter*values
+    values_high = values_split - (values_split-values)
+    values_low = values - values_high
+    scaled_error = ((values_high*scale - scaled) + values_low*scale)
+    rounded = np.rint(scaled)
+    ties = np.abs(scaled-rounded) == 0.5
+    rounded = np.where(ties & (scaled_error > 0), np.ceil(scaled), rounded)
+    rounded = np.where(ties & (scaled_error < 0), np.floor(scaled), rounded)
+    return rounded/scale
@@ -1,7 +1,11 @@
 
 from general import General
-from utility import Corpse, Food, Pollen
+from utility import Utility, Corpse, Food, Pollen
 from cells import Cells
+from registry import Registry
+from population import ProducerStore, vectorized_round
+from random_streams import RandomStream
+from trait_schema import TraitSchema
 import numpy as np
 import sys
 
@@ -22,7 +26,42 @@ class Producers(Cells):
     # reactions to  environmental dynamics - seasonal behaviour
 
     # class variables to be accesed by all the instances of Producers class
-    all_producer_cells_list: list = []
+    all_producer_cells_list: Registry = Registry()
+    type_code: int = General.producer_type
+    # columnar storage of all the producer cells, an instance is only a view on its slot
+    store: ProducerStore = ProducerStore()
+    # the position of the producer cells in Cells.all_cells_list
+    registry_kind: int = 0
+    # the (parent slot, pollen slot) pairings of the day (see use_all_pollen()), their offspring are created together by reproduce_all()
+    # the used pollen keep their slot (and genome) until then
+    pending_reproductions: list[tuple[int, int]] = []
+    # the deaths, foods, pollen and pollen uses asked for by the scalar main_loop_producer_cells, applied together by apply_pending()
+    # one entry per food (a cell can ask for two), the pollen uses with the reproduction roll of the cell
+    pending_deaths: list[int] = []
+    pending_foods: list[int] = []
+    pending_pollen: list[int] = []
+    pending_pollen_users: list[int] = []
+    pending_reproduction_rolls: list[float] = []
+    # the traits a pollen carries and an offspring inherits from its parent and the pollen
+    # (name, start_low, start_high, minimum, maximum, mutation_std, digits), see TraitSchema
+    trait_schema: TraitSchema = TraitSchema([
+        ("energy_capacity",                     0.5,   1.0,   0.5,   1.0,   0.05,   4),
+        ("energy_production_rate",              0.02,  0.1,   0.02,  0.1,   0.005,  4),
+        ("resilience",                          0.001, 1.0,   0.001, 1.0,   0.05,   4),
+        ("lifespan",                            0.5,   1.0,   0.5,   1.0,   0.05,   4),
+        ("aging_speed",                         0.002, 0.005, 0.002, 0.005, 0.0002, 4),
+        ("reproduction_rate",                   0.001, 0.02,  0.001, 0.02,  0.002,  4),
+        ("offspring_count",                     1,     4,     1,     4,     0.5,    0), # simulate discrete changes
+        ("pollen_production_rate",              0.001, 1.0,   0.001, 1.0,   0.05,   4),
+        ("ideal_pollen_production_temperature", -1.0,  1.0,   -1.0,  1.0,   0.1,    4),
+        ("evolution_rate",                      0.001, 1.0,   0.001, 1.0,   0.05,   4),
+    ])
+    # random numbers of the mutations of the pollen, a stream of their own so that they can be drawn for a whole day at once
+    mutation_random: RandomStream = RandomStream()
+    # random numbers of the producer cells, seeded by the simulation
+    random: RandomStream = RandomStream()
+    # every attribute but the slot is in the store
+    __slots__: tuple = ("slot",)
 
     def __init__(self, position_x: int, position_y, energy_capacity: float, energy_production_rate: float, resilience: float, lifespan: float, 
                  aging_speed: float, reproduction_rate: float, offspring_count: float, evolution_rate: float, current_energy: float, age: float,
@@ -30,6 +69,8 @@ class Producers(Cells):
                  temperature_level: int, elevation_level: int, humidity_level: int, radioactivity_level: int, productivity_level: int):
         ### DEBUGGING
         """start_time = time.perf_counter()"""
+        # the slot should be taken first, since every attribute is written into the store
+        self.slot: int = Producers.store.allocate(self)
         # inputted parameters + starting parameters are inheritted
         super().__init__(position_x, position_y, energy_capacity, energy_production_rate,
                          resilience, lifespan, aging_speed, reproduction_rate, offspring_count,
@@ -42,21 +83,11 @@ class Producers(Cells):
         self.humidity_level = humidity_level
         self.radioactivity_level = radioactivity_level
         self.productivity_level = productivity_level
-        self.name = f"PD-{elevation_level}{temperature_level}{humidity_level}"
         # derivated parameters from inputted parameters
-        self.color: tuple[int, int, int] = (int(elevation_level*255), abs(int(temperature_level*255)), int(humidity_level*255))
-        self.energy_consumption_rate = round((self.aging_speed*(1+(1-self.resilience))*
-                                        (1+0.15*self.elevation_level)*
-                                        (1+0.25*abs(self.temperature_level-2)**1.5)*
-                                        (1+0.2*abs(self.humidity_level-2)**1.5)), 4)
-        #self.energy_consumption_rate = round(1/(1+np.exp(-self.energy_consumption_rate))/100, 4) # normalized with sigmoid function
-        self.psychological_stress = round((1/(1+np.exp(-((self.energy_capacity-self.current_energy)-0.5))) + 
-                                     (self.age/self.lifespan)**2 + 
-                                     0.3*self.resilience + 
-                                     0.1*self.elevation_level/4 + 
-                                     0.2*(abs(self.temperature_level-2)/4) + 
-                                     0.15*(abs(self.humidity_level-2)/4)), 4)
-        #self.psychological_stress = round(1/(np.exp(-self.psychological_stress)), 4) # normalized
+        self.color = tuple(Producers.derive_color(elevation_level, temperature_level, humidity_level).tolist())
+        self.energy_consumption_rate = float(Producers.derive_energy_consumption_rate(aging_speed, resilience, elevation_level, temperature_level, humidity_level))
+        self.psychological_stress = float(Producers.derive_psychological_stress(energy_capacity, current_energy, age, lifespan, resilience,
+                                                                                elevation_level, temperature_level, humidity_level))
         # if panic_mode > 3 then it can no longer increase its metabolism in the area [-3, 3]
         self.panic_mode: int = 0
 
@@ -68,6 +99,41 @@ class Producers(Cells):
 
     def __repr__(self):
         return self.name
+
+    # the derived parameters, shared by __init__ and add_producer_cells(), for single values or arrays
+    @staticmethod
+    def derive_color(elevation_level, temperature_level, humidity_level) -> np.ndarray:
+        return np.stack((np.trunc(elevation_level*255), np.abs(np.trunc(temperature_level*255)), np.trunc(humidity_level*255)), axis=-1).astype(np.int64)
+
+    @staticmethod
+    def derive_energy_consumption_rate(aging_speed, resilience, elevation_level, temperature_level, humidity_level):
+        return vectorized_round(aging_speed*(1+(1-resilience))*
+                                (1+0.15*elevation_level)*
+                                (1+0.25*np.abs(temperature_level-2)**1.5)*
+                                (1+0.2*np.abs(humidity_level-2)**1.5))
+        #energy_consumption_rate = round(1/(1+np.exp(-energy_consumption_rate))/100, 4) # normalized with sigmoid function
+
+    @staticmethod
+    def derive_psychological_stress(energy_capacity, current_energy, age, lifespan, resilience, elevation_level, temperature_level, humidity_level):
+        return vectorized_round(1/(1+np.exp(-((energy_capacity-current_energy)-0.5))) +
+                                (age/lifespan)**2 +
+                                0.3*resilience +
+                                0.1*elevation_level/4 +
+                                0.2*(np.abs(temperature_level-2)/4) +
+                                0.15*(np.abs(humidity_level-2)/4))
+        #psychological_stress = round(1/(np.exp(-psychological_stress)), 4) # normalized
+
+    @property
+    def name(self) -> str:
+        return f"PD-{self.elevation_level}{self.temperature_level}{self.humidity_level}"
+
+    @property
+    def color(self) -> tuple[int, int, int]:
+        return tuple(Producers.store.color[self.slot].tolist())
+
+    @color.setter
+    def color(self, value: tuple[int, int, int]) -> None:
+        Producers.store.color[self.slot] = value
     
     @classmethod
     def generate_starting_producer_cells(cls, producer_cell_count: int) -> None:
@@ -93,245 +159,200 @@ class Producers(Cells):
         if producer_cell_count > General.total_grid_cells:
             raise ValueError("producer_cell_count exceeds available cells")
             
-        linear_indices = np.random.choice(General.total_grid_cells, size=producer_cell_count, replace=False)
+        linear_indices = Producers.random.sample(General.total_grid_cells, producer_cell_count)
         x_indices, y_indices = np.unravel_index(linear_indices, (grid_size, grid_size))
-        for i in range(producer_cell_count):
-            x_idx, y_idx = x_indices[i], y_indices[i]
-            pos_x, pos_y = x_idx * 10, y_idx * 10
-            ### DEBUGGING
-            energy_capacity = round(np.random.uniform(0.5, 1.0), 4)
-            energy_production_rate = round(np.random.uniform(0.02, 0.1), 4)
-            resilience = round(np.random.uniform(0.001, 1.0), 4)
-            lifespan = round(np.random.uniform(0.5, 1.0), 4)
-            aging_speed = round(np.random.uniform(0.002, 0.005), 4)
-            reproduction_rate = round(np.random.uniform(0.001, 0.02), 4)
-            offspring_count = np.random.randint(1, 4)
-            evolution_rate = round(np.random.uniform(0.001, 1.0), 4)
-            pollen_production_rate = round(np.random.uniform(0.001, 1.0), 4)
-            ideal_pollen_production_temperature = round(np.random.uniform(-1.0, 1.0), 4)
-            new_producer_cell = Producers(
-                pos_x, pos_y,
-                energy_capacity,
-                energy_production_rate,
-                resilience,
-                lifespan,
-                aging_speed,
-                reproduction_rate,
-                offspring_count,
-                evolution_rate,
-                energy_capacity/2, # current enery is equal to half of energy_capacity
-                0.0,
-                pollen_production_rate,
-                ideal_pollen_production_temperature,
-                General.temperature_matrix[y_idx, x_idx],
-                General.elevation_matrix[y_idx, x_idx],
-                General.humidity_matrix[y_idx, x_idx],
-                General.radioactivity_matrix[y_idx, x_idx],
-                General.productivity_matrix[y_idx, x_idx],
-            )
-            # add the producers to the matrixes / lists
-            General.all_cells_matrix[y_idx, x_idx] = new_producer_cell
-            Producers.all_producer_cells_list.append(new_producer_cell)
-            Cells.all_cells_list.append(new_producer_cell)
-
+        genomes = Producers.trait_schema.sample(Producers.random, producer_cell_count)
+        columns: dict[str, np.ndarray] = {trait: genomes[:, i] for i, trait in enumerate(Producers.trait_schema.names)}
+        columns["offspring_count"] = columns["offspring_count"].astype(np.int64)
+        columns["current_energy"] = columns["energy_capacity"]/2 # current enery is equal to half of energy_capacity
+        columns["age"] = np.zeros(producer_cell_count)
+        columns["temperature_level"] = General.temperature_matrix[y_indices, x_indices]
+        columns["elevation_level"] = General.elevation_matrix[y_indices, x_indices]
+        columns["humidity_level"] = General.humidity_matrix[y_indices, x_indices]
+        columns["radioactivity_level"] = General.radioactivity_matrix[y_indices, x_indices]
+        columns["productivity_level"] = General.productivity_matrix[y_indices, x_indices]
+        columns["position_x"], columns["position_y"] = x_indices*10, y_indices*10
+        # add the producers to the store, the matrixes and the lists
+        Producers.add_producer_cells(columns)
 
         ### DEBUGGING
         """end_time = time.perf_counter()
         print(f"generate_starting_producer_cells took {end_time - start_time:.6f} seconds")"""
 
+    # the side effects of a cell are applied at the end of its stage of the day by apply_pending(), with the ones of all the others
     def die(self) -> None:
-        Producers.all_producer_cells_list.remove(self)
-        Cells.all_cells_list.remove(self)
-        General.all_cells_matrix[int(self.position_y//10), int(self.position_x//10)] = None
-        General.all_utility_matrix[int(self.position_y//10), int(self.position_x//10)] = Corpse(self.position_x, self.position_y)
+        Producers.pending_deaths.append(self.slot)
 
     def produce_energy_and_food(self) -> None:
-        possible_food_positions = General.area_3x3[:]
-        np.random.shuffle(possible_food_positions)
-        for dx, dy in possible_food_positions:
-            if (0 <= self.position_x+dx < General.world_size) and (0 <= self.position_y+dy < General.world_size):
-                # check if the cell is empty
-                if not(General.all_utility_matrix[(self.position_y+dy)//10, (self.position_x+dx)//10]):
-                    # create food
-                    General.all_utility_matrix[(self.position_y+dy)//10, (self.position_x+dx)//10] = Food(self.position_x+dx, self.position_y+dy)
-                    self.current_energy = round(min(self.energy_capacity, self.energy_production_rate + self.current_energy), 4)
-                    break
+        Producers.pending_foods.append(self.slot)
 
     def produce_pollen(self) -> None:
-        # Initialize parameters with current traits to pass to Pollen
-        params = {
-            'energy_capacity': self.energy_capacity,
-            'energy_production_rate': self.energy_production_rate,
-            'resilience': self.resilience,
-            'lifespan': self.lifespan,
-            'aging_speed': self.aging_speed,
-            'reproduction_rate': self.reproduction_rate,
-            'offspring_count': self.offspring_count,
-            'pollen_production_rate': self.pollen_production_rate,
-            'ideal_pollen_production_temperature': self.ideal_pollen_production_temperature,
-            'evolution_rate': self.evolution_rate,
-        }
-        # Define mutation parameters for each trait
-        traits = [
-            {
-                'name': 'energy_capacity',
-                'min': 0.5,
-                'max': 1.0,
-                'delta_std': 0.05,  # Biologically plausible mutation step (normal distribution)
-                'round': 4,
-            },
-            {
-                'name': 'energy_production_rate',
-                'min': 0.02,
-                'max': 0.1,
-                'delta_std': 0.005,
-                'round': 4,
-            },
-            {
-                'name': 'resilience',
-                'min': 0.001,
-                'max': 1.0,
-                'delta_std': 0.05,
-                'round': 4,
-            },
-            {
-                'name': 'lifespan',
-                'min': 0.5,
-                'max': 1.0,
-                'delta_std': 0.05,
-                'round': 4,
-            },
-            {
-                'name': 'aging_speed',
-                'min': 0.002,
-                'max': 0.005,
-                'delta_std': 0.0002,
-                'round': 4,
-            },
-            {
-                'name': 'reproduction_rate',
-                'min': 0.001,
-                'max': 0.02,
-                'delta_std': 0.002,
-                'round': 4,
-            },
-            {
-                'name': 'offspring_count',
-                'min': 1,
-                'max': 4,
-                'delta_std': 0.5,  # Simulate discrete changes
-                'round': 0,
-            },
-            {
-                'name': 'pollen_production_rate',
-                'min': 0.001,
-                'max': 1.0,
-                'delta_std': 0.05,
-                'round': 4,
-            },
-            {
-                'name': 'ideal_pollen_production_temperature',
-                'min': -1.0,
-                'max': 1.0,
-                'delta_std': 0.1,
-                'round': 4,
-            },
-            {
-                'name': 'evolution_rate',
-                'min': 0.001,
-                'max': 1.0,
-                'delta_std': 0.05,
-                'round': 4,
-            },
-        ]
-        # Vectorized mutation checks and computations
-        num_traits = len(traits)
-        mutation_probs = self.evolution_rate / 10  # Same as original 
-        # Generate all mutation flags in one call
-        mutation_mask = np.random.rand(num_traits) < mutation_probs  
-        if np.any(mutation_mask):
-            # Generate normally distributed deltas (smaller changes more likely)
-            deltas = np.random.normal(loc=0, scale=[t['delta_std'] for t in traits], size=num_traits)
-            deltas *= self.evolution_rate  # Scale by evolution rate
-            # Apply mutations only where mask is True
-            for i, trait in enumerate(traits):
-                if mutation_mask[i]:
-                    new_val = params[trait['name']] + deltas[i]
-                    new_val = np.clip(new_val, trait['min'], trait['max'])
-                    if trait['round'] is not None:
-                        new_val = round(new_val, trait['round'])
-                    params[trait['name']] = new_val
-        # Find pollen position (original logic optimized)
-        pollen_position_candidates = []
-        for dx, dy in General.area_2x2:
-            if 0 <= self.position_x+dx < General.world_size and 0 <= self.position_y+dy < General.world_size:
-                pollen_position_candidates.append((self.position_x + dx, self.position_y + dy))
-        available_pollen_positions = [(x, y) for x, y in pollen_position_candidates if not General.all_utility_matrix[y // 10, x // 10]]  
-        if available_pollen_positions:
-            x, y = available_pollen_positions[np.random.choice(len(available_pollen_positions))]
-            General.all_utility_matrix[y // 10, x // 10] = Pollen(
-                x, y, 
-                params['energy_capacity'],
-                params['energy_production_rate'],
-                params['resilience'],
-                params['lifespan'],
-                params['aging_speed'],
-                params['reproduction_rate'],
-                params['offspring_count'],
-                params['evolution_rate'],
-                params['pollen_production_rate'],
-                params['ideal_pollen_production_temperature']
-            )
-
-    def reproduce(self, to_be_used_pollen: Pollen) -> None:
-        # create a new producer cell with the same parameters as the pollen with mutation effects
-        for _ in range(self.offspring_count):
-            # Find available positions for offspring
-            offspring_position_candidates = [(self.position_x + dx, self.position_y + dy) for dx, dy in General.area_3x3]
-            available_offspring_positions = [(x, y) for x, y in offspring_position_candidates if ((0 <= x < General.world_size) and (0 <= y < General.world_size)) and 
-                                                                                                    (not General.all_utility_matrix[y // 10, x // 10])]
-            if available_offspring_positions:
-                x, y = available_offspring_positions[np.random.randint(0, len(available_offspring_positions))]
-                new_producer_cell_energy_capacity = round(((self.energy_capacity + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10))+to_be_used_pollen.energy_capacity)/2, 4)
-                new_producer_cell_energy_production_rate = round((self.energy_production_rate + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.energy_production_rate)/2, 4)
-                new_producer_cell_resilience = round((self.resilience + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.resilience)/2, 4)
-                new_producer_cell_lifespan = round((self.lifespan + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.lifespan)/2, 4)
-                new_producer_cell_aging_speed = round((self.aging_speed + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.aging_speed)/2, 4)
-                new_producer_cell_reproduction_rate = round((self.reproduction_rate + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.reproduction_rate)/2, 4)
-                new_producer_cell_offspring_count = round((self.offspring_count + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.offspring_count)/2)
-                new_producer_cell_pollen_production_rate = round((self.pollen_production_rate + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.pollen_production_rate)/2, 4)
-                new_producer_cell_ideal_pollen_production_temperature = min(1.0, max(-1.0, round((self.ideal_pollen_production_temperature + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.ideal_pollen_production_temperature)/2, 4)))
-                new_producer_cell_evolution_rate = round((self.evolution_rate + np.random.choice([-1, 1])*(self.evolution_rate/10+self.radioactivity_level/10)+to_be_used_pollen.evolution_rate)/2, 4)
-                # Create a new producer cell with the same parameters as the pollen with mutation effects
-                new_producer_cell = Producers(
-                    x, y,
-                    new_producer_cell_energy_capacity,
-                    new_producer_cell_energy_production_rate,
-                    new_producer_cell_resilience,
-                    new_producer_cell_lifespan,
-                    new_producer_cell_aging_speed,
-                    new_producer_cell_reproduction_rate,
-                    new_producer_cell_offspring_count,
-                    new_producer_cell_evolution_rate,
-                    self.energy_capacity / 2,  # current energy is equal to half of energy_capacity
-                    0.0,
-                    new_producer_cell_pollen_production_rate,
-                    new_producer_cell_ideal_pollen_production_temperature,
-                    General.temperature_matrix[int(y // 10), int(x // 10)],
-                    General.elevation_matrix[int(y // 10), int(x // 10)],
-                    General.humidity_matrix[int(y // 10), int(x // 10)],
-                    General.radioactivity_matrix[int(y // 10), int(x // 10)],
-                    General.productivity_matrix[int(y // 10), int(x // 10)]
-                )
-                # Add the new producer cell to the matrixes / lists
-                General.all_cells_matrix[int(y // 10), int(x // 10)] = new_producer_cell
-                Producers.all_producer_cells_list.append(new_producer_cell)
-                Cells.all_cells_list.append(new_producer_cell)
-                print(f"new producer cell created at {x//10}, {y//10}")
-
-    def main_loop_producer_cells(self) -> None:
+        Producers.pending_pollen.append(self.slot)
+
+    def use_pollen(self, reproduction_roll: float) -> None:
+        Producers.pending_pollen_users.append(self.slot)
+        Producers.pending_reproduction_rolls.append(reproduction_roll)
+
+    @classmethod
+    def apply_pending(cls) -> None:
+        # the side effects asked for by the scalar main_loop_producer_cells of the day
+        cls.apply_day(np.array(cls.pending_deaths, dtype=np.int64), np.array(cls.pending_foods, dtype=np.int64),
+                      np.array(cls.pending_pollen, dtype=np.int64), np.array(cls.pending_pollen_users, dtype=np.int64),
+                      np.array(cls.pending_reproduction_rolls, dtype=np.float64))
+        for pending in (cls.pending_deaths, cls.pending_foods, cls.pending_pollen, cls.pending_pollen_users, cls.pending_reproduction_rolls):
+            pending.clear()
+
+    @classmethod
+    def apply_day(cls, death_slots: np.ndarray, food_slots: np.ndarray, pollen_slots: np.ndarray, user_slots: np.ndarray,
+                  reproduction_rolls: np.ndarray) -> None:
+        """
+        The side effects of a day of the producer cells at once, in the order of the given slots.
+        1) the dying cells leave the registries and the map, a corpse is left on their grid cell
+        2) every food gets a random free grid cell of the 3x3 area around its cell, every pollen one of the 2x2 area,
+           a grid cell chosen by more than one goes to the first of them, the others choose again (see Neighbourhood.place)
+        3) a placed food gives its cell the energy of a day of production, up to its energy_capacity
+        4) the living cells use the pollen on their grid cell, with a chance of their reproduction_rate to reproduce
+        """
+        cls.die_all(death_slots)
+        cls.produce_all_food(food_slots)
+        cls.produce_all_pollen(pollen_slots)
+        cls.use_all_pollen(user_slots, reproduction_rolls)
+
+    @classmethod
+    def die_all(cls, slots: np.ndarray) -> None:
+        if not(len(slots)): return
+        cls.all_producer_cells_list.remove_many(slots)
+        Cells.all_cells_list.remove_many(slots, cls.registry_kind)
+        grid_ys, grid_xs = cls.store.position_y[slots]//10, cls.store.position_x[slots]//10
+        General.clear_cells(grid_ys, grid_xs)
+        Corpse.add_many(grid_ys, grid_xs)
+        cls.store.release_many(slots)
+
+    @classmethod
+    def place_around(cls, slots: np.ndarray, neighbourhood, type_code: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # a distinct grid cell without a utility around every given cell for a new utility of type_code, as (placed, rows, columns) of the placed ones
+        grid_ys, grid_xs = neighbourhood.place(cls.store.position_y[slots]//10, cls.store.position_x[slots]//10, cls.random,
+                                               General.utility_type_matrix.copy(), type_code)
+        placed = grid_ys >= 0
+        return placed, grid_ys[placed], grid_xs[placed]
+
+    @classmethod
+    def produce_all_food(cls, slots: np.ndarray) -> None:
+        if not(len(slots)): return
+        store = cls.store
+        placed, grid_ys, grid_xs = cls.place_around(slots, General.neighbourhood_3x3, General.food_type)
+        Food.add_many(grid_ys, grid_xs)
+        # the energy of every placed food, once more for the cells with two of them
+        fed_slots = slots[placed]
+        while len(fed_slots):
+            unique_slots, first_indices = np.unique(fed_slots, return_index=True)
+            store.current_energy[unique_slots] = vectorized_round(np.minimum(store.energy_capacity[unique_slots],
+                                                                             store.energy_production_rate[unique_slots] + store.current_energy[unique_slots]))
+            fed_slots = np.delete(fed_slots, first_indices)
+
+    @classmethod
+    def produce_all_pollen(cls, slots: np.ndarray) -> None:
+        # the genomes of the pollen are mutated from the traits of their cells, also for the ones without a free grid cell
+        if not(len(slots)): return
+        genomes = cls.mutate_genomes(slots)
+        placed, grid_ys, grid_xs = cls.place_around(slots, General.neighbourhood_2x2, General.pollen_type)
+        Pollen.add_many(grid_ys, grid_xs, genomes[placed])
+
+    @classmethod
+    def use_all_pollen(cls, slots: np.ndarray, reproduction_rolls: np.ndarray) -> None:
+        # the used pollen leave the map, the genome of the ones that lead to a reproduction is read by reproduce_all()
+        store = cls.store
+        grid_ys, grid_xs = store.position_y[slots]//10, store.position_x[slots]//10
+        on_pollen = General.utility_type_matrix[grid_ys, grid_xs] == General.pollen_type
+        if not(on_pollen.any()): return
+        slots, reproduction_rolls, grid_ys, grid_xs = slots[on_pollen], reproduction_rolls[on_pollen], grid_ys[on_pollen], grid_xs[on_pollen]
+        pollen_slots = General.utility_slot_matrix[grid_ys, grid_xs].astype(np.int64)
+        Pollen.all_pollen_list.remove_many(pollen_slots)
+        General.clear_utilities(grid_ys, grid_xs)
+        Utility.store.on_ground[pollen_slots] = False
+        reproduces = reproduction_rolls < store.reproduction_rate[slots]
+        cls.pending_reproductions.extend(zip(slots[reproduces].tolist(), pollen_slots[reproduces].tolist()))
+        Utility.release_slots(pollen_slots[~reproduces])
+
+    @classmethod
+    def reproduce_all(cls) -> list:
+        """
+        Creates the offspring of all the (parent, pollen) pairings of the day at once.
+        1) every parent has offspring_count offspring, each gets a random free grid cell of the 3x3 area around its parent,
+           a grid cell chosen by more than one offspring goes to the first pairing, the others choose again
+        2) every trait is the mean of the parent and the pollen, the parent one changed by +-(evolution_rate+radioactivity_level)/10
+        3) the newborns are added to the store, the grids and the registries together
+        """
+        if not(cls.pending_reproductions): return []
+        store = cls.store
+        parent_slots, pollen_slots = np.array(cls.pending_reproductions, dtype=np.int64).T
+        pollen_traits = Utility.store.genome[pollen_slots].astype(np.float64)
+        Utility.release_slots(pollen_slots)
+        cls.pending_reproductions.clear()
+
+        # placement, the grid cells taken in a round are not free in the next one
+        offspring_parents = np.repeat(np.arange(len(parent_slots)), np.maximum(store.offspring_count[parent_slots], 0))
+        parent_ys, parent_xs = store.position_y[parent_slots]//10, store.position_x[parent_slots]//10
+        offspring_ys, offspring_xs = General.neighbourhood_3x3.place(parent_ys[offspring_parents], parent_xs[offspring_parents], cls.random,
+                                                                     General.cell_type_matrix.copy(), General.producer_type, General.utility_type_matrix)
+        born = offspring_ys >= 0
+        if not(born.any()): return []
+        offspring_parents, grid_ys, grid_xs = offspring_parents[born], offspring_ys[born], offspring_xs[born]
+        offspring_parent_slots = parent_slots[offspring_parents]
+
+        # inheritance and mutation, one column per trait of Producers.trait_schema.names
+        parent_traits = cls.genomes(offspring_parent_slots)
+        mutation = store.evolution_rate[offspring_parent_slots]/10 + store.radioactivity_level[offspring_parent_slots]/10
+        signs = np.where(cls.random.random_array(parent_traits.shape) < 0.5, -1.0, 1.0)
+        traits = (parent_traits + signs*mutation[:, None] + pollen_traits[offspring_parents])/2
+        columns: dict[str, np.ndarray] = {trait: vectorized_round(traits[:, i]) for i, trait in enumerate(cls.trait_schema.names)}
+        # round() without digits, to the even integer like np.rint
+        columns["offspring_count"] = np.rint(traits[:, cls.trait_schema.index("offspring_count")]).astype(np.int64)
+        columns["ideal_pollen_production_temperature"] = np.clip(columns["ideal_pollen_production_temperature"], -1.0, 1.0)
+        columns["current_energy"] = store.energy_capacity[offspring_parent_slots]/2 # current energy is equal to half of energy_capacity of the parent
+        columns["age"] = np.zeros(len(grid_ys))
+        # the map levels are read at the grid indices, like the single newborns were
+        columns["temperature_level"] = General.temperature_matrix[grid_ys, grid_xs]
+        columns["elevation_level"] = General.elevation_matrix[grid_ys, grid_xs]
+        columns["humidity_level"] = General.humidity_matrix[grid_ys, grid_xs]
+        columns["radioactivity_level"] = General.radioactivity_matrix[grid_ys, grid_xs]
+        columns["productivity_level"] = General.productivity_matrix[grid_ys, grid_xs]
+        columns["position_x"], columns["position_y"] = grid_xs*10, grid_ys*10
+        return cls.add_producer_cells(columns)
+
+    @classmethod
+    def add_producer_cells(cls, columns: dict[str, np.ndarray]) -> list:
+        # bulk version of Producers(...): the given columns are written into new slots, the derived ones are computed like in __init__
+        count: int = len(columns["position_x"])
+        new_producer_cells: list[Producers] = [cls.__new__(cls) for _ in range(count)]
+        slots = cls.store.allocate_many(new_producer_cells)
+        for new_producer_cell, slot in zip(new_producer_cells, slots.tolist()):
+            new_producer_cell.slot = slot
+        store = cls.store
+        for column_name, values in columns.items():
+            getattr(store, column_name)[slots] = values
+        elevation, temperature, humidity = columns["elevation_level"], columns["temperature_level"], columns["humidity_level"]
+        resilience = columns["resilience"]
+        store.color[slots] = Producers.derive_color(elevation, temperature, humidity)
+        store.energy_consumption_rate[slots] = Producers.derive_energy_consumption_rate(columns["aging_speed"], resilience, elevation, temperature, humidity)
+        store.psychological_stress[slots] = Producers.derive_psychological_stress(columns["energy_capacity"], columns["current_energy"], columns["age"],
+                                                                                  columns["lifespan"], resilience, elevation, temperature, humidity)
+        store.panic_mode[slots] = 0
+        # Add the new producer cells to the matrixes / lists
+        General.set_cells(columns["position_y"]//10, columns["position_x"]//10, new_producer_cells, General.producer_type, slots)
+        Producers.all_producer_cells_list.append_many(new_producer_cells, slots)
+        Cells.all_cells_list.append_many(new_producer_cells, slots, Producers.registry_kind)
+        return new_producer_cells
+
+    def main_loop_producer_cells(self, rolls: np.ndarray = None) -> None:
+        # rolls are the random numbers of the day: aging, food chance, pollen chance and reproduction chance
+        # scalar reference of main_loop_all_producer_cells, both give the same results for the same rolls
+        # the death, the foods, the pollen and the pollen use are only asked for here, apply_pending() applies them after the loop
+        if rolls is None:
+            rolls = Producers.random.random_array(4)
+        aging_roll, food_roll, pollen_roll, reproduction_roll = rolls
         # if age > lifespan high chance, elif age < lifespan low chance, else get old
-        if (self.age > self.lifespan + np.random.uniform(0, 0.25)*(1+self.resilience)):
+        if (self.age > self.lifespan + aging_roll*0.25*(1+self.resilience)):
             self.die()
             return
         else:
@@ -387,21 +408,89 @@ class Producers(Cells):
             self.produce_energy_and_food()
 
         # produce food if by chance and energy capacity not met
-        if (np.random.random() < self.productivity_level/7) and (self.energy_capacity-self.current_energy):
+        if (food_roll < self.productivity_level/7) and (self.energy_capacity-self.current_energy):
             self.produce_energy_and_food()
         # produce pollen if by chance and the temperature (with the effect of evolution rate) is suitable
-        if (np.random.random() < self.pollen_production_rate/7): #and (max(-1.0, self.ideal_pollen_production_temperature-self.evolution_rate) < self.temperature_level < min(1.0, self.ideal_pollen_production_temperature+self.evolution_rate)):
+        if (pollen_roll < self.pollen_production_rate/7): #and (max(-1.0, self.ideal_pollen_production_temperature-self.evolution_rate) < self.temperature_level < min(1.0, self.ideal_pollen_production_temperature+self.evolution_rate)):
             self.produce_pollen()
 
-        # if the pollen is on the producer_cell, there is a chance to reproduction
-        if isinstance(General.all_utility_matrix[int(self.position_y//10), int(self.position_x//10)], Pollen):
-            to_be_used_pollen: Pollen = General.all_utility_matrix[int(self.position_y//10), int(self.position_x//10)]
-            Pollen.all_pollen_list.remove(to_be_used_pollen)
-            General.all_utility_matrix[int(to_be_used_pollen.position_y//10), int(to_be_used_pollen.position_x//10)] = None
-            # if by chance can reproduce
-            if np.random.random() < self.reproduction_rate:
-                self.reproduce(to_be_used_pollen)
-            print(f"Reproduced at {self.position_x}, {self.position_y}")
+        self.use_pollen(reproduction_roll)
+
+    @classmethod
+    def genomes(cls, slots: np.ndarray) -> np.ndarray:
+        # the traits of trait_schema of the given cells as (n, traits)
+        return np.stack([getattr(cls.store, trait)[slots] for trait in cls.trait_schema.names], axis=1).astype(np.float64)
+
+    @classmethod
+    def mutate_genomes(cls, slots: np.ndarray) -> np.ndarray:
+        # the genomes of the pollen of the given cells, in the order of slots
+        return cls.trait_schema.mutate(cls.genomes(slots), cls.store.evolution_rate[slots], cls.mutation_random)
+
+    @classmethod
+    def adjust_metabolism(cls, slots: np.ndarray, adjustment: np.ndarray, direction: int) -> None:
+        # batched version of the metabolism branches, direction 1 increases and -1 decreases the metabolism
+        store = cls.store
+        if direction == 1:
+            store.energy_production_rate[slots] = vectorized_round(np.minimum(0.1, store.energy_production_rate[slots] + adjustment))
+            store.resilience[slots] = vectorized_round(np.maximum(0.001, store.resilience[slots] - adjustment))
+            store.lifespan[slots] = vectorized_round(np.maximum(0.5, store.lifespan[slots] - adjustment))
+            store.aging_speed[slots] = vectorized_round(np.minimum(0.005, store.aging_speed[slots] + adjustment/200))
+            store.reproduction_rate[slots] = vectorized_round(np.maximum(0.001, store.reproduction_rate[slots] - adjustment/200))
+            store.offspring_count[slots] = np.maximum(1, store.offspring_count[slots] - 1)
+            store.evolution_rate[slots] = vectorized_round(np.maximum(0.001, store.evolution_rate[slots] - adjustment))
+            store.psychological_stress[slots] = vectorized_round(np.minimum(1.0, store.psychological_stress[slots] + adjustment))
+        else:
+            store.energy_production_rate[slots] = vectorized_round(np.maximum(0.02, store.energy_production_rate[slots] - adjustment))
+            store.resilience[slots] = vectorized_round(np.minimum(1.0, store.resilience[slots] + adjustment))
+            store.lifespan[slots] = vectorized_round(np.minimum(1.0, store.lifespan[slots] + adjustment))
+            store.aging_speed[slots] = vectorized_round(np.maximum(0.002, store.aging_speed[slots] - adjustment/200))
+            store.reproduction_rate[slots] = vectorized_round(np.minimum(0.02, store.reproduction_rate[slots] + adjustment/200))
+            store.offspring_count[slots] = np.minimum(4, store.offspring_count[slots] + 1)
+            store.evolution_rate[slots] = vectorized_round(np.minimum(1.0, store.evolution_rate[slots] + adjustment))
+            store.psychological_stress[slots] = vectorized_round(np.maximum(0.0, store.psychological_stress[slots] - adjustment))
+
+    @classmethod
+    def main_loop_all_producer_cells(cls, slots: np.ndarray, rolls: np.ndarray) -> None:
+        """
+        One day of main_loop_producer_cells for the cells of the given slots at once, rolls has one row per cell.
+        1) aging, death check and the three metabolism branches are applied with masked array operations
+        2) the deaths, foods, pollen and pollen uses of the day are applied together by apply_day(), in the order of slots
+        """
+        if not(len(slots)): return
+        store = cls.store
+
+        # aging and death
+        dies = store.age[slots] > store.lifespan[slots] + rolls[:, 0]*0.25*(1+store.resilience[slots])
+        living = ~dies
+        living_slots = slots[living]
+        store.age[living_slots] += store.aging_speed[living_slots]
+        store.current_energy[living_slots] = vectorized_round(store.current_energy[living_slots] - store.energy_consumption_rate[living_slots])
+
+        # metabolism branches, same precedence as the scalar conditions
+        production = store.energy_production_rate[slots]
+        consumption = store.energy_consumption_rate[slots]
+        energy = store.current_energy[slots]
+        panic_mode = store.panic_mode[slots]
+        increase = living & ((production < consumption) | ((energy < 0.4) & (panic_mode < 3)))
+        decrease = living & ~increase & (production > consumption) & (energy > 0.9) & (panic_mode > -3)
+        bankrupt = living & ~increase & ~decrease & (energy < 0.1) & (panic_mode < 3)
+        cls.adjust_metabolism(slots[increase], np.abs(production-consumption)[increase], 1)
+        store.panic_mode[slots[increase]] += 1
+        cls.adjust_metabolism(slots[decrease], ((production-consumption)/4)[decrease], -1)
+        store.panic_mode[slots[decrease]] -= 1
+        cls.adjust_metabolism(slots[bankrupt], (np.abs(production-consumption)*3)[bankrupt], 1)
+        store.panic_mode[slots[bankrupt]] += 3
+        forced_food = increase | bankrupt
+
+        # chance rolls, the food chance only if the energy capacity is not met
+        food_chance = living & (rolls[:, 1] < store.productivity_level[slots]/7) & (store.energy_capacity[slots] != store.current_energy[slots])
+        pollen_chance = living & (rolls[:, 2] < store.pollen_production_rate[slots]/7)
+        food_counts = forced_food.astype(np.int64) + food_chance
+        cls.apply_day(slots[dies], np.repeat(slots, food_counts), slots[pollen_chance], living_slots, rolls[living, 3])
+
+# every attribute stored in a column is read / written through the store
+for column_name in ProducerStore.columns:
+    setattr(Producers, column_name, ProducerStore.column_property(column_name))
 
 # TEST TEST TEST
 if __name__ == "__main__":
@@ -0,0 +1,54 @@
+
+import numpy as np
+
+class RandomStream():
+
+    # seeded random numbers of one subsystem of the simulation (the producers, the distributors, the utilities, the climate)
+    # the scalar draws are read from a block of pre-drawn numbers, so that a draw costs an index instead of a call into numpy
+    block_size: int = 4096
+
+    def __init__(self, seed = None):
+        # seed: an int, a np.random.SeedSequence or None for a fresh one
+        self.generator = np.random.default_rng(seed)
+        self.refill()
+
+    @staticmethod
+    def spawn(seed: int, count: int) -> list["RandomStream"]:
+        # independent streams from one seed, the same seed gives the same streams
+        return [RandomStream(child) for child in np.random.SeedSequence(seed).spawn(count)]
+
+    def get_state(self) -> tuple[dict, np.ndarray]:
+        # the state of the generator and the cursor (json friendly), and the pre-drawn block
+        return {"generator": self.generator.bit_generator.state, "cursor": self.cursor}, np.array(self.block)
+
+    def set_state(self, state: dict, block: np.ndarray) -> None:
+        # the stream goes on exactly like the one the state was taken from
+        self.generator.bit_generator.state = state["generator"]
+        self.block = block.tolist()
+        self.cursor = state["cursor"]
+
+    def refill(self) -> None:
+        self.block: list[float] = self.generator.random(self.block_size).tolist()
+        self.cursor: int = 0
+
+    def random(self) -> float:
+        # [0, 1)
+        if self.cursor == self.block_size:
+            self.refill()
+        value: float = self.block[self.cursor]
+        self.cursor += 1
+        return value
+
+    def uniform(self, low: float, high: float) -> float:
+        return low + (high-low)*self.random()
+
+    def choice(self, sequence):
+        return sequence[int(self.random()*len(sequence))]
+
+    # the array draws are taken from the generator itself
+    def random_array(self, shape) -> np.ndarray:
+        return self.generator.random(shape)
+
+    def sample(self, population, count: int) -> np.ndarray:
+        # count different elements of the population (or of range(population) for an int)
+        return self.generator.choice(population, size=count, replace=False)
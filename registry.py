@@ -0,0 +1,128 @@
+import numpy as np
+
+class Registry():
+
+    # list-like container of the entities of one kind, an entity is known by its handle: its slot in the store of its kind
+    # removals are deferred until flush(), so the registry can be iterated while entities die / get picked up,
+    # flush() then removes them in O(1) each by moving the last entity into the freed position
+    def __init__(self, kind_count: int = 1, capacity: int = 1024):
+        # a registry of more than one kind interleaves their slots: slot*kind_count + registry_kind of the entity (see Cells.all_cells_list)
+        self.kind_count: int = kind_count
+        self.items: list = []
+        # handle of the entity at each position of items
+        self.handles: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        # handle -> its position in items (-1 if not in the registry)
+        self.positions: np.ndarray = np.full(capacity, -1, dtype=np.int64)
+        # insertion ordered, so that flush() moves the entities the same way on every run
+        self.pending_removals: dict[int, None] = {}
+
+    def __len__(self) -> int:
+        return len(self.items) - len(self.pending_removals)
+
+    def __contains__(self, item) -> bool:
+        handle: int = self.handle(item)
+        if (handle >= len(self.positions)) or (handle in self.pending_removals):
+            return False
+        position: int = int(self.positions[handle])
+        return (position >= 0) and (self.items[position] is item)
+
+    def __iter__(self):
+        # the entities registered at the start of the iteration, the ones removed (or replaced) in the meantime are skipped
+        items: list = self.items
+        handles: list[int] = self.handles[:len(items)].tolist()
+        pending_removals = self.pending_removals
+        for position, (item, handle) in enumerate(zip(items[:], handles)):
+            if (handle not in pending_removals) and (items[position] is item):
+                yield item
+
+    def __repr__(self):
+        return f"Registry({list(self)})"
+
+    def handle(self, item) -> int:
+        if self.kind_count == 1:
+            return item.slot
+        return item.slot*self.kind_count + item.registry_kind
+
+    def reserve(self, handle_count: int, item_count: int) -> None:
+        # room for the handles below handle_count and for item_count entities
+        if handle_count > len(self.positions):
+            positions = np.full(max(handle_count, 2*len(self.positions)), -1, dtype=np.int64)
+            positions[:len(self.positions)] = self.positions
+            self.positions = positions
+        if item_count > len(self.handles):
+            handles = np.zeros(max(item_count, 2*len(self.handles)), dtype=np.int64)
+            handles[:len(self.handles)] = self.handles
+            self.handles = handles
+
+    def append(self, item) -> int:
+        handle: int = self.handle(item)
+        self.reserve(handle+1, len(self.items)+1)
+        position: int = int(self.positions[handle])
+        if handle in self.pending_removals:
+            # removed and added again on the same day: the same entity (e.g. a picked and dropped pollen),
+            # or a new one that got the slot of the removed one, it takes its position
+            del self.pending_removals[handle]
+            self.items[position] = item
+        elif position >= 0:
+            raise ValueError(f"{item} is already in the registry")
+        else:
+            self.handles[len(self.items)] = handle
+            self.positions[handle] = len(self.items)
+            self.items.append(item)
+        return handle
+
+    def append_many(self, items: list, slots: np.ndarray, registry_kind: int = 0) -> None:
+        # bulk version of append() for entities of one kind, with their slots
+        handles = slots*self.kind_count + registry_kind
+        if not(len(handles)): return
+        self.reserve(int(handles.max())+1, len(self.items)+len(items))
+        if (self.positions[handles] >= 0).any():
+            for item in items:
+                self.append(item)
+            return
+        start: int = len(self.items)
+        self.handles[start:start+len(items)] = handles
+        self.positions[handles] = np.arange(start, start+len(items))
+        self.items.extend(items)
+
+    def remove(self, item) -> None:
+        if item not in self:
+            raise ValueError(f"{item} is not in the registry")
+        self.pending_removals[self.handle(item)] = None
+
+    def remove_many(self, slots: np.ndarray, registry_kind: int = 0) -> None:
+        # bulk version of remove() for entities of one kind, by their slots
+        handles: list[int] = (slots*self.kind_count + registry_kind).tolist()
+        pending_removals = self.pending_removals
+        for handle in handles:
+            if (handle >= len(self.positions)) or (self.positions[handle] < 0) or (handle in pending_removals):
+                raise ValueError(f"the entity of slot {handle//self.kind_count} is not in the registry")
+            pending_removals[handle] = None
+
+    def clear(self) -> None:
+        self.positions[self.handles[:len(self.items)]] = -1
+        self.items.clear()
+        self.pending_removals.clear()
+
+    def get(self, handle: int):
+        return self.items[self.positions[handle]]
+
+    def slots(self) -> np.ndarray:
+        # the slots of the entities, in the order of the iteration (for a registry of one kind)
+        handles = self.handles[:len(self.items)]
+        if self.pending_removals:
+            handles = handles[~np.isin(handles, np.fromiter(self.pending_removals, dtype=np.int64))]
+        return handles.copy()//self.kind_count
+
+    def flush(self) -> None:
+        items, handles, positions = self.items, self.handles, self.positions
+        for handle in self.pending_removals:
+            position: int = int(positions[handle])
+            positions[handle] = -1
+            last_item = items.pop()
+            if position < len(items):
+                items[position] = last_item
+                last_handle: int = int(handles[len(items)])
+                handles[position] = last_handle
+                positions[last_handle] = position
+        self.pending_removals.clear()
@@ -0,0 +1,293 @@
+
+from general import General
+from producers import Producers
+from distributors import Distributors
+from cells import Cells
+from utility import Utility, Corpse, Food, Pollen
+from population import ProducerStore, UtilityPool, DistributorStore
+from random_streams import RandomStream
+import numpy as np
+import sys
+import threading
+
+class Snapshot():
+
+    # read-only view of the simulation state that a consumer (e.g. Visual) can render
+    def __init__(self, days_elapsed: int, day: int, month: int, year: int,
+                 producer_count: int, distributor_count: int,
+                 corpse_count: int, food_count: int, pollen_count: int, temperature_version: int,
+                 utility_pool_size: int = 0, utility_pool_hit_rate: float = 0.0,
+                 cell_types: np.ndarray = None, cell_colors: np.ndarray = None,
+                 utility_types: np.ndarray = None, utility_colors: np.ndarray = None,
+                 temperature_tiles: np.ndarray = None, dirty_tiles: np.ndarray = None):
+        self.days_elapsed = days_elapsed
+        self.day = day
+        self.month = month
+        self.year = year
+        self.producer_count = producer_count
+        self.distributor_count = distributor_count
+        self.corpse_count = corpse_count
+        self.food_count = food_count
+        self.pollen_count = pollen_count
+        # the released utility views kept for reuse, and the share of the new utilities that reused one
+        self.utility_pool_size = utility_pool_size
+        self.utility_pool_hit_rate = utility_pool_hit_rate
+        # changes with every update of General.temperature_matrix, so that a renderer knows when to draw it again
+        self.temperature_version = temperature_version
+        # copies of the grids, so that the snapshot can be rendered while the simulation goes on (read-only, None if not asked for)
+        # the type code and the color of the cell / the utility of every grid cell
+        self.cell_types = cell_types
+        self.cell_colors = cell_colors
+        self.utility_types = utility_types
+        self.utility_colors = utility_colors
+        # the temperature at the top-left pixel of every grid cell, the one a map view shows
+        self.temperature_tiles = temperature_tiles
+        # the grid cells changed since the previous snapshot as [[y1, x1], [y2, x2], ...]
+        self.dirty_tiles = dirty_tiles
+
+    @staticmethod
+    def freeze(array: np.ndarray) -> np.ndarray:
+        array.flags.writeable = False
+        return array
+
+class Simulation():
+
+    # in terms of the calendar: 30 days = 1 month and 12 months(360 days) = 1 year
+    days_per_month: int = 30
+    months_per_year: int = 12
+
+    def __init__(self, producer_cell_count: int = 100, distributor_cell_count: int = 150,
+                 vectorized_producers: bool = True, map_path: str = None, map_seed: int = None, seed: int = None):
+        # the cells, the utilities and the grids are class level, the ones of a previous simulation in the process are dropped
+        Simulation.reset_state()
+        # the map is chosen before the cells are created, by default map_1234.npz
+        if (map_path is not None) or (map_seed is not None):
+            General.load_map(map_path, map_seed)
+        # every subsystem draws from its own stream, the same seed gives the same run (None for a random one)
+        self.climate_random: RandomStream = Simulation.seed_streams(seed)
+        # the scalar main_loop_producer_cells is kept as the reference of the batched kernel
+        self.vectorized_producers: bool = vectorized_producers
+        self.days_elapsed: int = 0
+        self.day: int = 0
+        self.month: int = 0
+        self.year: int = 0
+        self.temperature_version: int = 0
+        # the temperature_tiles of the snapshots are copied again only after a temperature update
+        self.temperature_tiles: np.ndarray = None
+        self.temperature_tiles_version: int = -1
+
+        # create the cells upon initializing
+        Producers.generate_starting_producer_cells(producer_cell_count)
+        Distributors.generate_starting_distributor_cells(distributor_cell_count)
+
+    @staticmethod
+    def reset_state() -> None:
+        # an empty world: no cells or utilities in the registries, the stores and the grids, and the temperature of the map file
+        for registry in (Producers.all_producer_cells_list, Distributors.all_distributor_cells_list, Cells.all_cells_list,
+                         Corpse.all_corpses_list, Food.all_foods_list, Pollen.all_pollen_list):
+            registry.clear()
+        Producers.store = ProducerStore()
+        Producers.pending_reproductions.clear()
+        Distributors.store = DistributorStore()
+        Utility.store = UtilityPool()
+        Utility.free_views = {type_code: [] for type_code in Utility.kinds}
+        Utility.pool_requests, Utility.pool_hits = 0, 0
+        General.clear_grids()
+        # the seasons change the temperature layer in place, it is mapped again from the file
+        if General.map_store is not None:
+            General.map_store.layers.pop("temperature_smoothed_matrix", None)
+
+    @staticmethod
+    def seed_streams(seed: int = None) -> RandomStream:
+        # the streams of the producers, the distributors and the utilities are set on their classes, the climate one is given back
+        Producers.random, Distributors.random, Utility.random, climate_random, Producers.mutation_random = RandomStream.spawn(seed, 5)
+        return climate_random
+
+    def update_calendar(self) -> None:
+        self.day = self.days_elapsed%self.days_per_month
+        self.month = (self.days_elapsed//self.days_per_month)%self.months_per_year
+        self.year = self.days_elapsed//(self.days_per_month*self.months_per_year)
+
+    # seasonal change
+    def update_temperature_map(self, phase_shift: int = 0, randomness: float = 0) -> None:
+        """Vectorized monthly temperature update for entire matrix"""
+        day_of_year: int = self.month * 30
+
+        # Single calculation for all cells
+        radian = (2 * np.pi / 365) * (day_of_year - phase_shift)
+        seasonal_swing = np.sin(radian) * General.elevation_matrix / 50
+
+        # In-place operations for memory efficiency
+        np.add(General.temperature_matrix, seasonal_swing, out=General.temperature_matrix)
+        if randomness:
+            np.add(General.temperature_matrix,
+                self.climate_random.generator.uniform(-randomness, randomness, General.temperature_matrix.shape),
+                out=General.temperature_matrix)
+        # In-place clipping avoids creating new array
+        np.clip(General.temperature_matrix, -1.0, 1.0, out=General.temperature_matrix)
+        self.temperature_version += 1
+
+    def update_cells_temperature(self, cells_list: list) -> None:
+        if not(cells_list): return
+
+        y_positions = [cell.position_y for cell in cells_list]
+        x_positions = [cell.position_x for cell in cells_list]
+        new_temperatures = General.temperature_matrix[y_positions, x_positions]
+        for cell, temp in zip(cells_list, new_temperatures):
+            cell.temperature_level = temp
+
+    def run_day(self) -> None:
+        self.days_elapsed += 1
+        self.update_calendar()
+        if self.day//29 == 1: # update temperature monthly for the map and the cells
+            self.update_temperature_map()
+            self.update_cells_temperature(Cells.all_cells_list)
+
+        # in game daily loop for the cells / utilities
+        # the producers alive at the start of the day are processed, the newborns start the next day
+        producer_slots = Producers.all_producer_cells_list.slots()
+        producer_rolls = Producers.random.random_array((len(producer_slots), 4))
+        if self.vectorized_producers:
+            Producers.main_loop_all_producer_cells(producer_slots, producer_rolls)
+        else:
+            producer_views: list = Producers.store.views
+            for slot, rolls in zip(producer_slots.tolist(), producer_rolls):
+                producer_cell: Producers = producer_views[slot]
+                producer_cell.main_loop_producer_cells(rolls)
+            Producers.apply_pending()
+        # the offspring of all the pollinations of the day are placed together
+        Producers.reproduce_all()
+        for distributor_cell in Distributors.all_distributor_cells_list:
+            distributor_cell: Distributors
+            distributor_cell.main_loop_distributor_cells()
+        # the corpses, foods and pollen on the ground decompose in one batched step
+        Utility.decay_all()
+
+        # the removals of the day are applied at once
+        self.flush_registries()
+
+    def flush_registries(self) -> None:
+        for registry in (Producers.all_producer_cells_list, Distributors.all_distributor_cells_list, Cells.all_cells_list,
+                         Corpse.all_corpses_list, Food.all_foods_list, Pollen.all_pollen_list):
+            registry.flush()
+
+    def step(self, n_days: int = 1) -> None:
+        for _ in range(n_days):
+            self.run_day()
+
+    def run_until(self, day: int) -> None:
+        # day is the total amount of days elapsed since the start of the simulation
+        while self.days_elapsed < day:
+            self.run_day()
+
+    def snapshot(self, grids: bool = False) -> Snapshot:
+        # with grids=True the snapshot also holds what is needed to draw the map, and the changed grid cells are taken
+        if grids:
+            grid_arrays: dict[str, np.ndarray] = self.get_grid_arrays()
+        else:
+            grid_arrays: dict[str, np.ndarray] = {}
+        return Snapshot(
+            self.days_elapsed, self.day, self.month, self.year,
+            len(Producers.all_producer_cells_list),
+            len(Distributors.all_distributor_cells_list),
+            len(Corpse.all_corpses_list),
+            len(Food.all_foods_list),
+            len(Pollen.all_pollen_list),
+            self.temperature_version,
+            Utility.pool_size(),
+            Utility.pool_hit_rate(),
+            **grid_arrays,
+        )
+
+    def get_grid_arrays(self) -> dict[str, np.ndarray]:
+        tile_count: int = General.world_size//10
+        cell_colors = np.zeros((tile_count, tile_count, 3), dtype=np.uint8)
+        producer_mask = General.cell_type_matrix == General.producer_type
+        cell_colors[producer_mask] = Producers.store.color[General.cell_slot_matrix[producer_mask]]
+        distributor_mask = General.cell_type_matrix == General.distributor_type
+        cell_colors[distributor_mask] = Distributors.store.color[General.cell_slot_matrix[distributor_mask]]
+        utility_colors = np.zeros((tile_count, tile_count, 3), dtype=np.uint8)
+        utility_mask = General.utility_slot_matrix != General.empty_slot
+        utility_colors[utility_mask] = Utility.store.color[General.utility_slot_matrix[utility_mask]]
+        if self.temperature_tiles_version != self.temperature_version:
+            self.temperature_tiles = Snapshot.freeze(General.temperature_matrix[::10, ::10].copy())
+            self.temperature_tiles_version = self.temperature_version
+        return {
+            "cell_types": Snapshot.freeze(General.cell_type_matrix.copy()),
+            "cell_colors": Snapshot.freeze(cell_colors),
+            "utility_types": Snapshot.freeze(General.utility_type_matrix.copy()),
+            "utility_colors": Snapshot.freeze(utility_colors),
+            "temperature_tiles": self.temperature_tiles,
+            "dirty_tiles": Snapshot.freeze(General.take_dirty_tiles()),
+        }
+
+class SimulationRunner():
+
+    # runs the days of a simulation on a worker thread and keeps the latest snapshot for the renderer
+    # the renderer never reads the state of the simulation itself, only the snapshots
+    def __init__(self, simulation: Simulation):
+        self.simulation: Simulation = simulation
+        self.target_day: int = simulation.days_elapsed
+        self.condition = threading.Condition()
+        self.latest_snapshot: Snapshot = simulation.snapshot(grids=True)
+        self.snapshot_taken: bool = False
+        self.running: bool = False
+        self.thread: threading.Thread = None
+
+    def start(self) -> None:
+        self.running = True
+        self.thread = threading.Thread(target=self.work, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def run_until(self, day: int) -> None:
+        # the days are simulated on the worker, so this returns immediately
+        with self.condition:
+            if day > self.target_day:
+                self.target_day = day
+                self.condition.notify()
+
+    def work(self) -> None:
+        while True:
+            with self.condition:
+                while self.running and (self.simulation.days_elapsed >= self.target_day):
+                    self.condition.wait()
+                if not(self.running): return
+            self.simulation.run_day()
+            self.publish(self.simulation.snapshot(grids=True))
+
+    def publish(self, snapshot: Snapshot) -> None:
+        with self.condition:
+            if not(self.snapshot_taken):
+                # the previous snapshot was never rendered, its changed grid cells are passed on
+                snapshot.dirty_tiles = Snapshot.freeze(np.concatenate([self.latest_snapshot.dirty_tiles, snapshot.dirty_tiles]))
+            self.latest_snapshot = snapshot
+            self.snapshot_taken = False
+
+    def take_snapshot(self) -> Snapshot:
+        # the latest snapshot, or None if it was already taken
+        with self.condition:
+            if self.snapshot_taken:
+                return None
+            self.snapshot_taken = True
+            return self.latest_snapshot
+
+# headless run, e.g. "python simulation.py 3600" for 10 years without a display,
+# "python simulation.py 3600 42" for the same on map_42.npz and "python simulation.py 3600 42 7" for a repeatable run
+if __name__ == "__main__":
+    days_to_simulate = int(sys.argv[1]) if len(sys.argv) > 1 else 360
+    test_simulation = Simulation(map_seed=int(sys.argv[2]) if len(sys.argv) > 2 else None,
+                                 seed=int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    test_simulation.run_until(days_to_simulate)
+    snapshot = test_simulation.snapshot()
+    print(f"day {snapshot.days_elapsed}: {snapshot.producer_count} producers, {snapshot.distributor_count} distributors, "
+          f"{snapshot.corpse_count} corpses, {snapshot.food_count} foods, {snapshot.pollen_count} pollen")
+    print(f"utility pool: {snapshot.utility_pool_size} views, {snapshot.utility_pool_hit_rate:.1%} of the utilities reused one")
+    sys.exit()
@@ -0,0 +1,57 @@
+
+import numpy as np
+
+class SpatialIndex():
+
+    # count of every type code in the buckets of bucket_size x bucket_size grid cells of a type matrix of General
+    # a query only scans the buckets that hold the asked type, so its cost grows with the entities nearby, not with the area
+    def __init__(self, type_matrix: np.ndarray, type_count: int, bucket_size: int = 8):
+        self.type_matrix: np.ndarray = type_matrix
+        self.type_count: int = type_count
+        self.bucket_size: int = bucket_size
+        self.rebuild()
+
+    def rebuild(self) -> None:
+        # counts every grid cell of the type matrix again, e.g. after it was written without update()
+        bucket_size: int = self.bucket_size
+        bucket_count: int = -(-self.type_matrix.shape[0]//bucket_size)
+        self.counts = np.zeros((bucket_count, bucket_count, self.type_count), dtype=np.int32)
+        grid_ys, grid_xs = np.indices(self.type_matrix.shape)
+        np.add.at(self.counts, (grid_ys//bucket_size, grid_xs//bucket_size, self.type_matrix), 1)
+
+    def update(self, grid_y: int, grid_x: int, old_type: int, new_type: int) -> None:
+        # should be called for every write into the type matrix
+        if old_type == new_type: return
+        bucket = self.counts[grid_y//self.bucket_size, grid_x//self.bucket_size]
+        bucket[old_type] -= 1
+        bucket[new_type] += 1
+
+    def update_many(self, grid_ys: np.ndarray, grid_xs: np.ndarray, old_types: np.ndarray, new_types) -> None:
+        # batched update() for distinct grid cells
+        bucket_ys, bucket_xs = grid_ys//self.bucket_size, grid_xs//self.bucket_size
+        np.subtract.at(self.counts, (bucket_ys, bucket_xs, old_types), 1)
+        np.add.at(self.counts, (bucket_ys, bucket_xs, new_types), 1)
+
+    def within_distance(self, grid_y: int, grid_x: int, distance: int, type_code: int) -> np.ndarray:
+        # grid positions [[y1, x1], [y2, x2], ...] of the given type with a manhattan distance <= distance,
+        # in the order of the rows like np.argwhere over the area
+        bucket_size: int = self.bucket_size
+        last_cell: int = self.type_matrix.shape[0]-1
+        area_y0, area_y1 = max(0, grid_y-distance), min(last_cell, grid_y+distance)
+        area_x0, area_x1 = max(0, grid_x-distance), min(last_cell, grid_x+distance)
+        bucket_y0, bucket_x0 = area_y0//bucket_size, area_x0//bucket_size
+        bucket_ys, bucket_xs = np.nonzero(self.counts[bucket_y0:area_y1//bucket_size+1, bucket_x0:area_x1//bucket_size+1, type_code])
+        found_positions: list[np.ndarray] = []
+        for bucket_y, bucket_x in zip((bucket_ys+bucket_y0).tolist(), (bucket_xs+bucket_x0).tolist()):
+            # the part of the bucket within the area
+            window_y0, window_x0 = max(area_y0, bucket_y*bucket_size), max(area_x0, bucket_x*bucket_size)
+            window_y1, window_x1 = min(area_y1, bucket_y*bucket_size+bucket_size-1), min(area_x1, bucket_x*bucket_size+bucket_size-1)
+            window = self.type_matrix[window_y0:window_y1+1, window_x0:window_x1+1]
+            found_positions.append(np.argwhere(window == type_code) + (window_y0, window_x0))
+        if not(found_positions):
+            return np.empty((0, 2), dtype=np.int64)
+        positions = np.concatenate(found_positions)
+        positions = positions[np.abs(positions[:, 0]-grid_y) + np.abs(positions[:, 1]-grid_x) <= distance]
+        if len(found_positions) > 1:
+            positions = positions[np.lexsort((positions[:, 1], positions[:, 0]))]
+        return positions
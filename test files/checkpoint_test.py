@@ -0,0 +1,70 @@
+# saves a simulation with Checkpoint, then goes on with it and with a restored copy in another process
+# the state right after the restore and after the same days should be identical
+# run from the root of the repository: python "test files/checkpoint_test.py"
+import hashlib
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+def state_hash() -> str:
+    import numpy as np
+    from general import General
+    from producers import Producers
+    from distributors import Distributors
+    from cells import Cells
+    from utility import Utility, Corpse, Food, Pollen
+
+    state: list = []
+    state += [tuple(getattr(cell, name) for name in Producers.store.columns) for cell in Producers.all_producer_cells_list]
+    state += [tuple(getattr(cell, name) for name in Distributors.store.columns) + (tuple(cell.current_polen_list),)
+              for cell in Distributors.all_distributor_cells_list]
+    state += [(type(cell).__name__, cell.slot) for cell in Cells.all_cells_list]
+    for kind in (Corpse, Food, Pollen):
+        state += [(utility.slot, utility.position_x, utility.position_y, utility.prolificacy, utility.decomposition_rate, utility.on_ground,
+                   utility.color) for utility in kind.registry]
+    state += [Producers.store.free_slots, Utility.store.free_slots, Distributors.store.free_slots, Utility.pool_size()]
+    digest = hashlib.md5(repr(state).encode())
+    for array in (General.cell_type_matrix, General.cell_slot_matrix, General.utility_type_matrix, General.utility_slot_matrix,
+                  General.temperature_matrix, Utility.store.genome[Utility.store.alive], Utility.store.dropped_by[Utility.store.alive]):
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()
+
+def run(mode: str, path: str, days: int) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import io
+    import contextlib
+    from simulation import Simulation
+    from checkpoint import Checkpoint
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "save":
+            simulation = Simulation(producer_cell_count=2000, distributor_cell_count=2000, seed=7)
+            simulation.run_until(days)
+            start_time = time.perf_counter()
+            Checkpoint.save(simulation, path)
+        else:
+            start_time = time.perf_counter()
+            simulation = Checkpoint.load(path)
+        end_time = time.perf_counter()
+        checkpoint_hash = state_hash()
+        simulation.run_until(simulation.days_elapsed + days)
+    print(f"RESULT {checkpoint_hash} {state_hash()} {end_time - start_time:.3f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1], sys.argv[2], int(sys.argv[3]))
+        sys.exit()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path: str = os.path.join(directory, "checkpoint.npz")
+        for mode in ("save", "load"):
+            output = subprocess.run([sys.executable, __file__, mode, path, "45"], capture_output=True, text=True).stdout
+            result_line = [line for line in output.splitlines() if line.startswith("RESULT")][0]
+            results[mode] = result_line.split()[1:]
+            print(f"{mode}: took {results[mode][2]} seconds")
+        print(f"checkpoint size {os.path.getsize(path)/2**20:.1f} MB")
+    print("identical after the restore" if results["save"][0] == results["load"][0] else "DIFFERENT after the restore")
+    print("identical after 45 more days" if results["save"][1] == results["load"][1] else "DIFFERENT after 45 more days")
@@ -0,0 +1,67 @@
+# memory per entity of the object API, with 100k entities of one kind
+# the views, their registries and their share of the columnar stores are counted with tracemalloc, then split by part
+# every kind is measured in its own process, so that the stores start empty
+# run from the root of the repository: python "test files/entity_memory_benchmark.py"
+import os
+import subprocess
+import sys
+import tracemalloc
+
+ENTITY_COUNT: int = 100_000
+
+def run(kind: str) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    from producers import Producers
+    from distributors import Distributors
+    from utility import Utility, Corpse, Food, Pollen
+    from general import General
+
+    world_size: int = General.world_size
+    genome = np.zeros(10, dtype=np.float32)
+    def new_producer(i: int) -> Producers:
+        new_producer_cell = Producers(i%world_size, i%world_size, 0.75, 0.05, 0.5, 0.75, 0.003, 0.01, 2, 0.5, 0.375, 0.0,
+                                      0.5, 0.0, 0.5, 0.5, 0.5, 0.1, 0.5)
+        Producers.all_producer_cells_list.append(new_producer_cell)
+        return new_producer_cell
+    def new_distributor(i: int) -> Distributors:
+        new_distributor_cell = Distributors(i%world_size, i%world_size, 0.3, 0.004, 0.5, 0.2, 0.003, 0.006, 4, 0.5, 0.75, 100,
+                                            0.15, 0.0, 0.5)
+        Distributors.all_distributor_cells_list.append(new_distributor_cell)
+        return new_distributor_cell
+    # the utilities add themselves to their registry and to the utility matrix (the same grid cells again and again)
+    create = {
+        "Producers": new_producer,
+        "Distributors": new_distributor,
+        "Corpse": lambda i: Corpse(i%world_size, i%world_size),
+        "Food": lambda i: Food(i%world_size, i%world_size),
+        "Pollen": lambda i: Pollen(i%world_size, i%world_size, genome),
+    }[kind]
+
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    entities = [create(i) for i in range(ENTITY_COUNT)]
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # the list holding them here is not part of the entities
+    total: float = (after - before - sys.getsizeof(entities)) / ENTITY_COUNT
+
+    # where it goes: the columns of the store (with its spare capacity) and its views list, the registry, the rest is the objects
+    store = {"Producers": Producers.store, "Distributors": Distributors.store}.get(kind, Utility.store)
+    cell_registries = {"Producers": Producers.all_producer_cells_list, "Distributors": Distributors.all_distributor_cells_list}
+    registry = cell_registries[kind] if kind in cell_registries else type(entities[0]).registry
+    store_arrays = [getattr(store, name) for name in list(store.columns) + ["color", "alive"]]
+    columns: float = sum(array.nbytes for array in store_arrays) / ENTITY_COUNT
+    views: float = sys.getsizeof(store.views) / ENTITY_COUNT
+    registry_bytes: float = (sys.getsizeof(registry.items) + registry.handles.nbytes + registry.positions.nbytes) / ENTITY_COUNT
+    print(f"RESULT {total:.1f} {columns:.1f} {views:.1f} {registry_bytes:.1f} {total - columns - views - registry_bytes:.1f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1])
+        sys.exit()
+
+    for kind in ("Producers", "Distributors", "Corpse", "Food", "Pollen"):
+        output = subprocess.run([sys.executable, __file__, kind], capture_output=True, text=True).stdout
+        total, columns, views, registry, objects = [line for line in output.splitlines() if line.startswith("RESULT")][0].split()[1:]
+        print(f"{kind:>12}: {total:>8} bytes per entity (store columns {columns}, views list {views}, registry {registry}, objects {objects})")
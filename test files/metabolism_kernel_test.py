@@ -0,0 +1,61 @@
+# compares Producers.main_loop_all_producer_cells with the scalar main_loop_producer_cells
+# both modes are run in their own process with the same seed, the states should be identical
+# the producer stage (kernel: the metabolism and the deaths, foods, pollen and pollen uses it asks for) is timed on its own
+# and with the rest of the day (reproduction, decay, registries), at 10k+ producers
+# run from the root of the repository: python "test files/metabolism_kernel_test.py"
+import os
+import subprocess
+import sys
+import time
+
+def run(mode: str, producer_cell_count: int, days: int) -> None:
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import numpy as np
+    from producers import Producers
+    from utility import Utility, Corpse, Food, Pollen
+    from cells import Cells
+    from simulation import Simulation
+
+    np.random.seed(1234)
+    Simulation.seed_streams(1234)
+    Producers.generate_starting_producer_cells(producer_cell_count)
+    kernel_time: float = 0.0
+    start_time = time.perf_counter()
+    for _ in range(days):
+        producer_slots = Producers.all_producer_cells_list.slots()
+        producer_rolls = np.random.random((len(producer_slots), 4))
+        kernel_start_time = time.perf_counter()
+        if mode == "vectorized":
+            Producers.main_loop_all_producer_cells(producer_slots, producer_rolls)
+        else:
+            for slot, rolls in zip(producer_slots.tolist(), producer_rolls):
+                Producers.store.views[slot].main_loop_producer_cells(rolls)
+            Producers.apply_pending()
+        kernel_time += time.perf_counter() - kernel_start_time
+        Producers.reproduce_all()
+        Utility.decay_all()
+        for registry in (Producers.all_producer_cells_list, Corpse.all_corpses_list, Food.all_foods_list, Pollen.all_pollen_list, Cells.all_cells_list):
+            registry.flush()
+    end_time = time.perf_counter()
+
+    state = [tuple(getattr(cell, name) for name in Producers.store.columns) for cell in Producers.all_producer_cells_list]
+    state += [(food.position_x, food.position_y, food.prolificacy) for food in Food.all_foods_list]
+    state += [(pollen.position_x, pollen.position_y, tuple(pollen.genome.tolist())) for pollen in Pollen.all_pollen_list]
+    print(f"RESULT {hash(tuple(state))} {len(Producers.all_producer_cells_list)} {end_time - start_time:.3f} {kernel_time:.3f}")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        run(sys.argv[1], int(sys.argv[2]), int(sys.argv[3]))
+        sys.exit()
+
+    for producer_cell_count in ("10000", "50000"):
+        results = {}
+        for mode in ("scalar", "vectorized"):
+            output = subprocess.run([sys.executable, __file__, mode, producer_cell_count, "30"], capture_output=True, text=True).stdout
+            result_line = [line for line in output.splitlines() if line.startswith("RESULT")][0]
+            results[mode] = result_line.split()[1:]
+            print(f"{producer_cell_count} {mode}: producers {results[mode][1]}, took {results[mode][2]} seconds, kernel {results[mode][3]} seconds")
+        kernel_speedup: float = float(results["scalar"][3]) / float(results["vectorized"][3])
+        day_speedup: float = float(results["scalar"][2]) / float(results["vectorized"][2])
+        print(f"{producer_cell_count} speedup: kernel {kernel_speedup:.1f}x, whole day {day_speedup:.1f}x")
+        print("identical" if results["scalar"][0] == results["vectorized"][0] else "DIFFERENT")
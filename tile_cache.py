@@ -0,0 +1,109 @@
+
+# pre-rendered surfaces of the map views, so that a frame only blits the visible part of them
+import pygame
+import numpy as np
+
+class MapView():
+
+    # a layer of the map shown with 10 colors: value <= thresholds[0] -> color_numbers[0], ..., else color_numbers[-1]
+    # same as the if / elif chains of Visual.determine_*_color
+    def __init__(self, matrix: np.ndarray, thresholds: list[float], color_numbers: list[int], colors: dict[int, tuple[int, int, int]]):
+        self.matrix = matrix
+        self.thresholds = np.array(thresholds)
+        self.color_numbers = np.array(color_numbers)
+        # palette lookup table: color number -> rgb
+        self.palette = np.array([colors[color_number] for color_number in range(len(colors))], dtype=np.uint8)
+
+    def classify(self, values: np.ndarray) -> np.ndarray:
+        return self.color_numbers[np.searchsorted(self.thresholds, values, side="left")]
+
+class TileCache():
+
+    def __init__(self, world_size: int, tile_size: int = 10, background: tuple[int, int, int] = (255, 255, 255)):
+        self.world_size: int = world_size
+        self.tile_size: int = tile_size
+        self.background = background
+        # map view number -> its rendered surface of the whole world, and the version of the layer it was rendered from
+        self.surfaces: dict[int, pygame.Surface] = {}
+        # map view number -> the pixels of its surface as [x, y, rgb], the background of render_region()
+        self.pixels: dict[int, np.ndarray] = {}
+        self.versions: dict[int, int] = {}
+
+    def get_surface(self, view_number: int, map_view: MapView, version: int = 0) -> pygame.Surface:
+        # the surface is rendered again only if the layer changed since, e.g. the monthly temperature update
+        if (view_number not in self.surfaces) or (self.versions[view_number] != version):
+            self.surfaces[view_number], self.pixels[view_number] = self.render_layer(map_view)
+            self.versions[view_number] = version
+        return self.surfaces[view_number]
+
+    def invalidate(self, view_number: int) -> None:
+        self.surfaces.pop(view_number, None)
+        self.pixels.pop(view_number, None)
+        self.versions.pop(view_number, None)
+
+    def render_layer(self, map_view: MapView) -> tuple[pygame.Surface, np.ndarray]:
+        # every tile gets the color of the value at its top-left pixel, drawn as a (tile_size-1)² square like pygame.draw.rect did
+        # a matrix with one value per tile (e.g. Snapshot.temperature_tiles) is already sampled
+        tile_values = map_view.matrix
+        if tile_values.shape[0] != self.world_size//self.tile_size:
+            tile_values = tile_values[::self.tile_size, ::self.tile_size]
+        tile_colors = map_view.palette[map_view.classify(tile_values)]
+        return self.render_tiles(tile_colors)
+
+    def render_tiles(self, tile_colors: np.ndarray) -> tuple[pygame.Surface, np.ndarray]:
+        tile_count: int = tile_colors.shape[0]
+        tile_size: int = self.tile_size
+        pixels = np.empty((tile_count, tile_size, tile_count, tile_size, 3), dtype=np.uint8)
+        pixels[:] = self.background
+        pixels[:, :tile_size-1, :, :tile_size-1] = tile_colors[:, None, :, None]
+        pixels = pixels.reshape(tile_count*tile_size, tile_count*tile_size, 3)
+        # surfarray is indexed as [x, y]
+        pixels = np.ascontiguousarray(pixels.transpose(1, 0, 2))
+        return pygame.surfarray.make_surface(pixels), pixels
+
+    def render_region(self, target: pygame.Surface, view_number: int, tile_rows: slice, tile_columns: slice,
+                      layers: list[tuple[np.ndarray, np.ndarray]]) -> None:
+        # the tiles of the region are drawn again at once: the background of the map view, then the entities of the layers in order
+        # a layer is (mask of the tiles with an entity [y, x], their colors in the order of mask), e.g. the utilities then the cells
+        tile_size: int = self.tile_size
+        region = pygame.Rect(tile_columns.start*tile_size, tile_rows.start*tile_size,
+                             (tile_columns.stop-tile_columns.start)*tile_size, (tile_rows.stop-tile_rows.start)*tile_size)
+        pixels = self.pixels[view_number][region.left:region.right, region.top:region.bottom].copy()
+        # the upper layers cover the lower ones, so every tile gets the color of its top entity
+        tile_colors = np.zeros((tile_rows.stop-tile_rows.start, tile_columns.stop-tile_columns.start, 3), dtype=np.uint8)
+        tile_mask = np.zeros(tile_colors.shape[:2], dtype=bool)
+        for mask, colors in layers:
+            tile_colors[mask] = colors
+            tile_mask |= mask
+        # surfarray is indexed as [x, y]; pixels[dx::tile_size, dy::tile_size] is the pixel (dx, dy) of every tile
+        # the same (tile_size-3)² square of every tile as pygame.draw.rect(surface, color, (x+2, y+2, 7, 7))
+        tile_colors = tile_colors.transpose(1, 0, 2)
+        tile_mask = tile_mask.T[:, :, None]
+        for dx in range(2, tile_size-1):
+            for dy in range(2, tile_size-1):
+                np.copyto(pixels[dx::tile_size, dy::tile_size], tile_colors, where=tile_mask)
+        pygame.surfarray.blit_array(target.subsurface(region), pixels)
+
+    def get_grid_surface(self, view_number: int, line_color: tuple[int, int, int]) -> pygame.Surface:
+        # lines between the tiles on the background
+        if view_number not in self.surfaces:
+            surface = pygame.Surface((self.world_size, self.world_size))
+            surface.fill(self.background)
+            pixels = pygame.surfarray.pixels3d(surface)
+            # in the gaps between the tiles of the layers
+            pixels[self.tile_size-1::self.tile_size, :] = line_color
+            pixels[:, self.tile_size-1::self.tile_size] = line_color
+            del pixels # unlocks the surface
+            self.surfaces[view_number] = surface
+            self.pixels[view_number] = pygame.surfarray.array3d(surface)
+            self.versions[view_number] = 0
+        return self.surfaces[view_number]
+
+    def get_blank_surface(self, view_number: int) -> pygame.Surface:
+        if view_number not in self.surfaces:
+            surface = pygame.Surface((self.world_size, self.world_size))
+            surface.fill(self.background)
+            self.surfaces[view_number] = surface
+            self.pixels[view_number] = pygame.surfarray.array3d(surface)
+            self.versions[view_number] = 0
+        return self.surfaces[view_number]
@@ -0,0 +1,64 @@
+
+# the traits of a kind of cell as one static table, used for the starting cells (and for the mutations of the pollen)
+import numpy as np
+from population import vectorized_round
+from random_streams import RandomStream
+
+class StartingTraits():
+
+    # the traits of the starting cells of a kind, for the kinds whose traits do not mutate
+    # rows: (name, start_low, start_high, digits), a starting cell gets a value of [start_low, start_high)
+    # digits is the rounding of the values, 0 for the whole number traits (drawn as integers)
+    def __init__(self, rows: list[tuple]):
+        self.names: tuple[str, ...] = tuple(row[0] for row in rows)
+        self.start_lows: np.ndarray = np.array([row[1] for row in rows], dtype=np.float64)
+        self.start_highs: np.ndarray = np.array([row[2] for row in rows], dtype=np.float64)
+        self.digits: list[int] = [row[3] for row in rows]
+        self.whole: np.ndarray = np.array([digits == 0 for digits in self.digits])
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def index(self, name: str) -> int:
+        return self.names.index(name)
+
+    def round(self, genomes: np.ndarray) -> np.ndarray:
+        # every column with the digits of its trait, like round(value, digits)
+        rounded = np.empty_like(genomes)
+        for digits in set(self.digits):
+            columns = [i for i, trait_digits in enumerate(self.digits) if trait_digits == digits]
+            rounded[:, columns] = vectorized_round(genomes[:, columns], digits)
+        return rounded
+
+    def sample(self, random: RandomStream, count: int) -> np.ndarray:
+        # (count, traits) genomes of starting cells, one row of uniform draws per cell
+        draws = random.random_array((count, len(self)))
+        spans = self.start_highs - self.start_lows
+        return np.where(self.whole, self.start_lows + np.floor(draws*spans), self.round(self.start_lows + draws*spans))
+
+class TraitSchema(StartingTraits):
+
+    # the heritable traits of a kind, the starting ones and their mutations
+    # rows: (name, start_low, start_high, minimum, maximum, mutation_std, digits)
+    # a mutation is clipped to [minimum, maximum], see StartingTraits for the others
+    def __init__(self, rows: list[tuple]):
+        super().__init__([(row[0], row[1], row[2], row[6]) for row in rows])
+        self.minimums: np.ndarray = np.array([row[3] for row in rows], dtype=np.float64)
+        self.maximums: np.ndarray = np.array([row[4] for row in rows], dtype=np.float64)
+        self.mutation_stds: np.ndarray = np.array([row[5] for row in rows], dtype=np.float64)
+
+    def mutate(self, genomes: np.ndarray, evolution_rates: np.ndarray, random: RandomStream) -> np.ndarray:
+        """
+        Mutated copies of the (n, traits) genomes, every trait of a row mutates with a chance of its evolution_rate/10.
+        1) the change is normally distributed with the mutation_std of the trait, scaled by the evolution_rate
+        2) a mutated trait is clipped to its bounds and rounded, the others are kept as they are
+        every row takes 3*traits uniform draws, so mutating the rows one by one gives the same genomes as all at once
+        """
+        trait_count: int = len(self)
+        draws = random.random_array((len(genomes), 3, trait_count))
+        mutates = draws[:, 0] < (evolution_rates/10)[:, None]
+        # box-muller, standard normal numbers from the other two draws
+        normals = np.sqrt(-2*np.log1p(-draws[:, 1])) * np.cos(2*np.pi*draws[:, 2])
+        mutated = genomes + normals*self.mutation_stds*evolution_rates[:, None]
+        mutated = self.round(np.clip(mutated, self.minimums, self.maximums))
+        return np.where(mutates, mutated, genomes)
@@ -1,101 +1,253 @@
+
 from general import General
+from registry import Registry
+from population import UtilityPool, vectorized_round
+from random_streams import RandomStream
 import numpy as np
 
-class Corpse():
-
-    all_corpses_list: list = []
-
-    def __init__(self, position_x:int, position_y:int):
+class Utility():
+
+    # columnar storage of all the corpses, foods and pollen, an instance is only a view on its slot
+    store: UtilityPool = UtilityPool()
+    # random numbers of the utilities, seeded by the simulation
+    random: RandomStream = RandomStream()
+    # color of a utility with a prolificacy below 0.2, indexed by the type code
+    faded_colors = np.zeros((4, 3), dtype=np.uint8)
+    faded_colors[General.corpse_type] = General.colors["gray"]
+    faded_colors[General.food_type] = General.colors["brown"]
+    faded_colors[General.pollen_type] = General.colors["yellow"]
+    # type code -> the class of the utility, filled in below the subclasses
+    kinds: dict[int, type] = {}
+    # type code -> the views of the released utilities of the kind, reused by __new__ so that a steady day creates almost no objects
+    # (the slots are reused by the store), also filled in below the subclasses
+    free_views: dict[int, list] = {}
+    # how many utilities were created and how many of them got a reused view
+    pool_requests: int = 0
+    pool_hits: int = 0
+    # every attribute but the slot is in the store
+    __slots__: tuple = ("slot",)
+
+    def __new__(cls, *args, **kwargs):
+        # a reused view is initialized again by __init__, every column of its new slot is written there
+        Utility.pool_requests += 1
+        free_views: list = Utility.free_views[cls.type_code]
+        if free_views:
+            Utility.pool_hits += 1
+            return free_views.pop()
+        return super().__new__(cls)
+
+    # the prolificacy, decomposition_rate and color are set in place for a new or a reused view
+    def __init__(self, position_x: int, position_y: int, decomposition_rate: float, prolificacy: float, color: tuple[int, int, int]):
+        self.slot: int = Utility.store.allocate(self)
         self.position_x, self.position_y = position_x, position_y
+        Utility.store.type_code[self.slot] = self.type_code
+        self.decomposition_rate = decomposition_rate
+        self.prolificacy = prolificacy
+        self.color = color
+        self.on_ground = True
 
-        self.decomposition_rate = round(np.random.uniform(0.002, 0.005), 4)
-        self.prolificacy = round(np.random.uniform(0.75, 1.0), 4)
-        self.color = General.colors["black"]
+    @property
+    def color(self) -> tuple[int, int, int]:
+        return tuple(Utility.store.color[self.slot].tolist())
 
-        Corpse.all_corpses_list.append(self)
-        General.all_utility_matrix[self.position_y//10, self.position_x//10] = self
+    @color.setter
+    def color(self, value: tuple[int, int, int]) -> None:
+        Utility.store.color[self.slot] = value
 
     def decompose(self) -> None:
         self.prolificacy -= self.decomposition_rate
 
-    def corpse_main_loop(self) -> None:
+    def release(self) -> None:
+        # the utility is gone for good (e.g. a used pollen), its slot and its view can be reused
+        Utility.release_slot(self.slot)
+
+    @classmethod
+    def add_many(cls, grid_ys: np.ndarray, grid_xs: np.ndarray) -> np.ndarray:
+        """
+        Bulk version of cls(grid_x*10, grid_y*10) for a subclass, on distinct grid cells, gives back the slots.
+        1) the released views of the kind are reused first, in the order __new__ would pop them
+        2) the decomposition_rate and the prolificacy are drawn from the ranges of the kind, one row of draws per utility
+        3) the new utilities are added to the registry of the kind and to the map, replacing the utilities already there
+        """
+        count: int = len(grid_ys)
+        free_views: list = Utility.free_views[cls.type_code]
+        reused_count: int = min(count, len(free_views))
+        views: list = free_views[len(free_views)-reused_count:][::-1] + [object.__new__(cls) for _ in range(count-reused_count)]
+        del free_views[len(free_views)-reused_count:]
+        Utility.pool_requests += count
+        Utility.pool_hits += reused_count
+        store = Utility.store
+        slots = store.allocate_many(views)
+        for view, slot in zip(views, slots.tolist()):
+            view.slot = slot
+        store.position_x[slots], store.position_y[slots] = grid_xs*10, grid_ys*10
+        store.type_code[slots] = cls.type_code
+        draws = Utility.random.random_array((count, 2))
+        (decomposition_low, decomposition_high), (prolificacy_low, prolificacy_high) = cls.decomposition_rates, cls.prolificacies
+        store.decomposition_rate[slots] = vectorized_round(decomposition_low + (decomposition_high-decomposition_low)*draws[:, 0])
+        store.prolificacy[slots] = vectorized_round(prolificacy_low + (prolificacy_high-prolificacy_low)*draws[:, 1])
+        store.color[slots] = cls.start_color
+        store.on_ground[slots] = True
+        cls.registry.append_many(views, slots)
+        General.set_utilities(grid_ys, grid_xs, views, cls.type_code, slots)
+        return slots
+
+    @classmethod
+    def release_slot(cls, slot: int) -> None:
+        view: Utility = cls.store.views[slot]
+        cls.free_views[view.type_code].append(view)
+        cls.store.release(slot)
+
+    @classmethod
+    def release_slots(cls, slots: np.ndarray) -> None:
+        views: list = cls.store.views
+        free_views: dict[int, list] = cls.free_views
+        for slot, type_code in zip(slots.tolist(), cls.store.type_code[slots].tolist()):
+            free_views[type_code].append(views[slot])
+        cls.store.release_many(slots)
+
+    @classmethod
+    def pool_size(cls) -> int:
+        # released views waiting to be reused
+        return sum(len(free_views) for free_views in cls.free_views.values())
+
+    @classmethod
+    def pool_hit_rate(cls) -> float:
+        return cls.pool_hits/cls.pool_requests if cls.pool_requests else 0.0
+
+    def utility_main_loop(self) -> None:
+        # scalar version of decay_all() for a single utility
         if self.prolificacy < 0.2:
-            self.color = General.colors["gray"]
+            self.color = tuple(Utility.faded_colors[self.type_code].tolist())
+            General.dirty_tile_matrix[self.position_y//10, self.position_x//10] = True
         if self.prolificacy > 0:
             self.decompose()
         else:
-            General.all_utility_matrix[self.position_y//10, self.position_x//10] = None
-            Corpse.all_corpses_list.remove(self)
+            if General.utility_slot_matrix[self.position_y//10, self.position_x//10] == self.slot:
+                General.set_utility(self.position_y//10, self.position_x//10, None)
+            type(self).registry.remove(self)
+            self.release()
+
+    @classmethod
+    def decay_all(cls) -> None:
+        # one day of decomposition for every utility on the ground at once
+        store = cls.store
+        slots = np.flatnonzero(store.alive & store.on_ground)
+        if not(len(slots)): return
+
+        prolificacy = store.prolificacy[slots]
+        faded_slots = slots[prolificacy < 0.2]
+        faded_colors = cls.faded_colors[store.type_code[faded_slots]]
+        # only the ones that just faded have to be drawn again
+        newly_faded_slots = faded_slots[(store.color[faded_slots] != faded_colors).any(axis=1)]
+        General.dirty_tile_matrix[store.position_y[newly_faded_slots]//10, store.position_x[newly_faded_slots]//10] = True
+        store.color[faded_slots] = faded_colors
+        decomposing = prolificacy > 0
+        store.prolificacy[slots[decomposing]] = prolificacy[decomposing] - store.decomposition_rate[slots[decomposing]]
+
+        # the expired utilities are cleared from the map, unless something else was placed on their tile since
+        expired_slots = slots[~decomposing]
+        if not(len(expired_slots)): return
+        grid_ys, grid_xs = store.position_y[expired_slots]//10, store.position_x[expired_slots]//10
+        still_on_map = General.utility_slot_matrix[grid_ys, grid_xs] == expired_slots
+        General.clear_utilities(grid_ys[still_on_map], grid_xs[still_on_map])
+        # every registry gets its expired utilities in the order of their slots, like one by one
+        expired_type_codes = store.type_code[expired_slots]
+        for type_code, kind in cls.kinds.items():
+            kind.registry.remove_many(expired_slots[expired_type_codes == type_code])
+        cls.release_slots(expired_slots)
+
+class Corpse(Utility):
+
+    all_corpses_list: Registry = Registry()
+    registry: Registry = all_corpses_list
+    type_code: int = General.corpse_type
+    # the ranges of the decomposition_rate and the prolificacy of a new corpse, and its color
+    decomposition_rates: tuple[float, float] = (0.002, 0.005)
+    prolificacies: tuple[float, float] = (0.75, 1.0)
+    start_color: tuple[int, int, int] = General.colors["black"]
+    __slots__: tuple = ()
+
+    def __init__(self, position_x:int, position_y:int):
+        decomposition_rate = round(Utility.random.uniform(*Corpse.decomposition_rates), 4)
+        prolificacy = round(Utility.random.uniform(*Corpse.prolificacies), 4)
+        super().__init__(position_x, position_y, decomposition_rate, prolificacy, Corpse.start_color)
+
+        Corpse.all_corpses_list.append(self)
+        General.set_utility(self.position_y//10, self.position_x//10, self)
+
+    def corpse_main_loop(self) -> None:
+        self.utility_main_loop()
 
         
 
-class Food():
+class Food(Utility):
 
-    all_foods_list: list = []
+    all_foods_list: Registry = Registry()
+    registry: Registry = all_foods_list
+    type_code: int = General.food_type
+    # the ranges of the decomposition_rate and the prolificacy of a new food, and its color
+    decomposition_rates: tuple[float, float] = (0.004, 0.010)
+    prolificacies: tuple[float, float] = (0.55, 0.9)
+    start_color: tuple[int, int, int] = General.colors["orange"]
+    __slots__: tuple = ()
 
     def __init__(self, position_x: int, position_y: int):
-        self.position_x, self.position_y = position_x, position_y
-
-        self.decomposition_rate = round(np.random.uniform(0.004, 0.010), 4)
-        self.prolificacy = round(np.random.uniform(0.55, 0.9), 4)
-        self.color = General.colors["orange"]
+        decomposition_rate = round(Utility.random.uniform(*Food.decomposition_rates), 4)
+        prolificacy = round(Utility.random.uniform(*Food.prolificacies), 4)
+        super().__init__(position_x, position_y, decomposition_rate, prolificacy, Food.start_color)
 
         Food.all_foods_list.append(self)
-        General.all_utility_matrix[self.position_y//10, self.position_x//10] = self
-
-    def decompose(self) -> None:
-        self.prolificacy -= self.decomposition_rate
+        General.set_utility(self.position_y//10, self.position_x//10, self)
 
     def food_main_loop(self) -> None:
-        if self.prolificacy < 0.2: 
-            self.color = General.colors["brown"]
-        if self.prolificacy > 0:
-            self.decompose()
-        else:
-            General.all_utility_matrix[self.position_y//10, self.position_x//10] = None
-            Food.all_foods_list.remove(self)
-
-
-
-class Pollen():
-
-    all_pollen_list: list = []
-
-    # attributes to be inherited from the producer_cell
-    def __init__(self, position_x: int, position_y: int,
-                 energy_capacity: float, energy_production_rate: float, resilience: float,
-                 lifespan: float, aging_speed: float, reproduction_rate: float, offspring_count: int,
-                 evolution_rate: float, pollen_production_rate: float, ideal_pollen_production_temperature: float,
-                 dropped_by = None) -> None:
-        self.position_x = position_x
-        self.position_y = position_y
-        self.energy_capacity = energy_capacity
-        self.energy_production_rate = energy_production_rate
-        self.resilience = resilience
-        self.lifespan = lifespan
-        self.aging_speed = aging_speed
-        self.reproduction_rate = reproduction_rate
-        self.offspring_count = offspring_count
-        self.evolution_rate = evolution_rate
-        self.pollen_production_rate = pollen_production_rate
-        self.ideal_pollen_production_temperature = ideal_pollen_production_temperature
-        self.dropped_by = dropped_by
-
-        self.decomposition_rate = round(np.random.uniform(0.008, 0.020), 4)
-        self.prolificacy = round(np.random.uniform(0.5, 0.85), 4)
-        self.color = General.colors["yellow"]
+        self.utility_main_loop()
+
+
+
+class Pollen(Utility):
+
+    # a pollen is a genome row of the utility store, the grid and the distributor cells only hold its slot (its id)
+    all_pollen_list: Registry = Registry()
+    registry: Registry = all_pollen_list
+    type_code: int = General.pollen_type
+    # the ranges of the decomposition_rate and the prolificacy of a new pollen, and its color
+    decomposition_rates: tuple[float, float] = (0.008, 0.020)
+    prolificacies: tuple[float, float] = (0.5, 0.85)
+    start_color: tuple[int, int, int] = General.colors["yellow"]
+    __slots__: tuple = ()
+
+    # genome: the traits inherited from the producer_cell, a row of Producers.trait_schema
+    def __init__(self, position_x: int, position_y: int, genome: np.ndarray) -> None:
+        decomposition_rate = round(Utility.random.uniform(*Pollen.decomposition_rates), 4)
+        prolificacy = round(Utility.random.uniform(*Pollen.prolificacies), 4)
+        super().__init__(position_x, position_y, decomposition_rate, prolificacy, Pollen.start_color)
+        Utility.store.genome[self.slot] = genome
+        Utility.store.dropped_by[self.slot] = -1
 
         Pollen.all_pollen_list.append(self)
-        General.all_utility_matrix[self.position_y//10, self.position_x//10] = self
+        General.set_utility(self.position_y//10, self.position_x//10, self)
 
-    def decompose(self) -> None:
-        self.prolificacy -= self.decomposition_rate
+    @classmethod
+    def add_many(cls, grid_ys: np.ndarray, grid_xs: np.ndarray, genomes: np.ndarray) -> np.ndarray:
+        # bulk version of Pollen(grid_x*10, grid_y*10, genome), with one genome row per pollen
+        slots = super().add_many(grid_ys, grid_xs)
+        Utility.store.genome[slots] = genomes
+        Utility.store.dropped_by[slots] = -1
+        return slots
+
+    @property
+    def genome(self) -> np.ndarray:
+        return Utility.store.genome[self.slot]
 
     def pollen_main_loop(self) -> None:
         # if the pollen is picked, it will not decompose
-        if self.prolificacy > 0:
-            self.decompose()
-        else:
-            General.all_utility_matrix[self.position_y//10, self.position_x//10] = None
-            Pollen.all_pollen_list.remove(self)
-            print("pollen died")
\ No newline at end of file
+        self.utility_main_loop()
+
+# so that the expired utilities can be removed from the registry of their kind by their type code
+Utility.kinds = {Corpse.type_code: Corpse, Food.type_code: Food, Pollen.type_code: Pollen}
+Utility.free_views = {type_code: [] for type_code in Utility.kinds}
+
+# every attribute stored in a column is read / written through the store
+for column_name in ("position_x", "position_y", "prolificacy", "decomposition_rate", "on_ground", "dropped_by"):
+    setattr(Utility, column_name, UtilityPool.column_property(column_name))
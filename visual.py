@@ -4,27 +4,28 @@
 import pygame
 import sys
 from general import General
-from opensimplex import OpenSimplex
 import random
 import numpy as np
-from scipy.signal import convolve2d
 from datetime import datetime
 from producers import Producers
 from distributors import Distributors
-from cells import Cells
-from utility import Corpse, Food, Pollen
+from simulation import Simulation, SimulationRunner, Snapshot
+from map_generator import MapGenerator
+from tile_cache import TileCache, MapView
+from debug_overlay import LabelOverlay
 
 class Visual():
 
-    def __init__(self):
+    def __init__(self, simulation: Simulation = None):
 
         
         pygame.init()
         self.fps: int = 60 # in terms of simulation: 1 second = 1 day, 30 secons = 1 month and 360 seconds(6 minutes) = 1 year
         self.seconds_till_start: int = 0
-        self.day: int = 0
-        self.month: int = 0
-        self.year: int = 0
+        # the simulation runs on its own thread, the visual only advances it in real time and renders its snapshots
+        self.simulation: Simulation = simulation if simulation is not None else Simulation()
+        self.simulation_runner = SimulationRunner(self.simulation)
+        self.snapshot: Snapshot = self.simulation_runner.take_snapshot()
 
         screen_info = pygame.display.Info()
         self.max_screen_width = screen_info.current_w
@@ -40,6 +41,8 @@ class Visual():
 
         pygame.font.init()
         self.font = pygame.font.Font(None, 15)
+        self.info_font = pygame.font.Font(None, 20)
+        self.text_surfaces: dict[tuple, pygame.Surface] = {}
 
         self.camera_x: int = 0
         self.camera_y: int = 0
@@ -49,10 +52,12 @@ class Visual():
         self.max_zoom: float= 2.0 # show x2 less area
         self.zoom_speed: float = 0.1
 
-        self.noise_elev = OpenSimplex(seed=1)
-        self.noise_temp = OpenSimplex(seed=2)
-        self.noise_hum = OpenSimplex(seed=3)
-        self.noise_prod = OpenSimplex(seed=4)
+        # the noise generators of the layers of the map generator below
+        self.map_generator = MapGenerator(seed=1, world_size=General.world_size)
+        self.noise_elev = self.map_generator.noise_elev
+        self.noise_temp = self.map_generator.noise_temp
+        self.noise_hum = self.map_generator.noise_hum
+        self.noise_prod = self.map_generator.noise_prod
         self.noise_scale: float = 0.02
         self.elevation_colors = {
             0: (46, 34, 22),    # Dark brown (highest elevation- mountain)
@@ -114,24 +119,37 @@ class Visual():
             1: (8, 226, 8),
             0: (0, 255, 0)       # Pure Green
         }
-        self.square_kernel = np.ones((21, 21))
-        # create the circle kernel
-        self.circle_kernel = np.zeros((2*5+1, 2*5+1)) # 2*radius+1
-        y, x = np.ogrid[-5:6, -5:6]
-        distance = np.sqrt(x**2+y**2)
-        self.circle_kernel[distance<=5]=1
-        self.circle_kernel/=np.sum(self.circle_kernel)
-        # load all the already created matrices34
-        self.all_matrices = np.load("map_1234.npz")
-        self.elevation_matrix = self.all_matrices["elevation_smoothed_matrix"]
-        self.temperature_matrix = self.all_matrices["temperature_smoothed_matrix"]
-        self.humidity_matrix = self.all_matrices["humidity_smoothed_matrix"]
-        self.radioactivity_matrix = self.all_matrices["radioactivity_smoothed_matrix"]
-        self.productivity_matrix = self.all_matrices["productivity_smoothed_matrix"]
-
-        # create the cells upon initializing
-        Producers.generate_starting_producer_cells(100)
-        Distributors.generate_starting_distributor_cells(150)
+        # the same layers as the simulation, from the map store of General
+        self.elevation_matrix = General.elevation_matrix
+        self.temperature_matrix = self.snapshot.temperature_tiles # from the snapshots, so the monthly update is shown
+        self.humidity_matrix = General.humidity_matrix
+        self.radioactivity_matrix = General.radioactivity_matrix
+        self.productivity_matrix = General.productivity_matrix
+        # the map views are rendered once into surfaces, a frame only blits the visible part of the chosen one
+        # the thresholds are the ones of the determine_*_color functions
+        self.tile_cache = TileCache(General.world_size, 10, General.colors["white"])
+        ten_steps: list[float] = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]
+        temperature_steps: list[float] = [-0.7, -0.6, -0.5, -0.3, -0.1, 0.3, 0.5, 0.6, 0.9]
+        descending_color_numbers: list[int] = [9, 8, 7, 6, 5, 4, 3, 2, 1, 0]
+        self.map_views: dict[int, MapView] = {
+            3: MapView(self.elevation_matrix, ten_steps, descending_color_numbers, self.elevation_colors),
+            4: MapView(self.temperature_matrix, temperature_steps, descending_color_numbers, self.temperature_colors),
+            5: MapView(self.humidity_matrix, ten_steps, descending_color_numbers, self.humidity_colors),
+            # classified like the temperature, as before
+            6: MapView(self.radioactivity_matrix, temperature_steps, descending_color_numbers, self.radioactivity_colors),
+            7: MapView(self.productivity_matrix, ten_steps, descending_color_numbers, self.productivity_colors),
+        }
+
+        # state of the world surface and of the scaled viewport, see draw_world() and set_camera()
+        self.world_key = None
+        # grid cells that should be drawn again once they are on the screen
+        self.pending_tile_matrix = np.zeros((General.world_size//10, General.world_size//10), dtype=bool)
+        self.world_version: int = 0
+        self.viewport_key = None
+        self.scaled_viewport = None
+        self.cell_label_overlay = LabelOverlay(self.font, {General.producer_type: "P", General.distributor_type: "D"}, General.colors["black"])
+        self.utility_label_overlay = LabelOverlay(self.font, {General.food_type: "F", General.corpse_type: "C", General.pollen_type: "L"}, General.colors["black"])
+
         self.cells_on_map = False
         self.utility_on_map = False
         self.cell_matrix_labels_on_map = False
@@ -181,19 +199,21 @@ class Visual():
         self.screen = pygame.display.set_mode((self.screen_width, self.screen_height), pygame.RESIZABLE)
 
     def set_camera(self) -> None:
-        self.screen.fill(General.colors["white"])
-
         view_height = int(self.screen_height/self.zoom_level)
         view_width = int(self.screen_width/self.zoom_level)
 
-        visible_area = pygame.Surface((view_width, view_height))
-        visible_area.blit(self.world, (0, 0), (self.camera_x, self.camera_y, view_width, view_height))
-
-        scaled_surface = pygame.transform.scale(visible_area, (self.screen_width, self.screen_height))
-        self.screen.blit(scaled_surface, (0, 0))
+        # the scaled viewport is made again only if the camera moved or the world was drawn on
+        viewport_key = (int(self.camera_x), int(self.camera_y), view_width, view_height, self.screen_width, self.screen_height, self.world_version)
+        if viewport_key != self.viewport_key:
+            self.viewport_key = viewport_key
+            visible_area = pygame.Surface((view_width, view_height))
+            visible_area.fill(General.colors["white"])
+            visible_area.blit(self.world, (0, 0), (self.camera_x, self.camera_y, view_width, view_height))
+            self.scaled_viewport = pygame.transform.scale(visible_area, (self.screen_width, self.screen_height))
+        self.screen.blit(self.scaled_viewport, (0, 0))
 
         # information on the screen
-        font = pygame.font.Font(None, 20)
+        font = self.info_font
         settings_info: list[str] = [
             f"Camera: ({int(self.camera_x)}, {int(self.camera_y)})",
             f"Zoom: {self.zoom_level:.2f}x",
@@ -214,29 +234,23 @@ class Visual():
             "N4: Utility Labels",
         ]
         for i, text in enumerate(settings_info):
-            settings_text_surface = font.render(text, True, General.colors["red"])
+            settings_text_surface = self.get_text_surface(text, General.colors["red"], font)
             self.screen.blit(settings_text_surface, (10, 10+i*25))
 
     def show_simulation_info(self) -> None:
         pygame.draw.rect(self.screen, General.colors["purple"], (self.screen_width-105, 0, 105, 100))
         simulation_info: list[str] = [
             "Days Elapsed: ",
-            f"Day: {self.seconds_till_start%30}",
-            f"Month: {self.seconds_till_start//30}",
-            f"Year: {self.seconds_till_start//360}"
+            f"Day: {self.snapshot.day}",
+            f"Month: {self.snapshot.days_elapsed//30}",
+            f"Year: {self.snapshot.year}"
         ]
-        font = pygame.font.Font(None, 20)
+        font = self.info_font
         for i, text in enumerate(simulation_info):
-            simulation_text_surface = font.render(text, True, General.colors["yellow"])
+            simulation_text_surface = self.get_text_surface(text, General.colors["yellow"], font)
             self.screen.blit(simulation_text_surface, (self.screen_width-100, 10+i*25))
 
     # 2) code snippet for the map generation
-    def draw_grid_map(self) -> None:
-        for y in range(0, self.screen_width+30, 10):
-            pygame.draw.line(self.world, General.colors["gray"], (self.camera_x+y-20, self.camera_y-20), (self.camera_x+y-20, self.camera_y+self.screen_height+20))
-        for x in range(0, self.screen_height+30, 10):
-            pygame.draw.line(self.world, General.colors["gray"], (self.camera_x-20, self.camera_y+x-20), (self.camera_x+self.screen_width+20, self.camera_y+x-20))
-
     def get_elevation(self, x: int, y: int) -> float:
         e: float = 1 * self.noise_elev.noise2(x * self.noise_scale * 1, y * self.noise_scale * 1)
         e += 0.5 * self.noise_elev.noise2(x * self.noise_scale * 2, y * self.noise_scale * 2)
@@ -379,51 +393,21 @@ class Visual():
         elif productivity <= 0.9: return 1
         else: return 0
 
-    def calculate_elevation_matrix(self) -> list[list[int]]:
-        elevation_matrix = [[self.get_elevation(x, y) for x in range(General.world_size)] for y in range(General.world_size)]
-        elevation_matrix_np = np.array(elevation_matrix)
-        elevation_sum = convolve2d(elevation_matrix_np, self.square_kernel, mode="same", boundary="fill")
-        elevation_counts = convolve2d(np.ones_like(elevation_matrix_np), self.square_kernel, mode="same", boundary="fill")
-        elevation_smoothed_matrix = elevation_sum / elevation_counts # np array matrix
-        return elevation_smoothed_matrix
-
-    def calculate_temperature_matrix(self, elevation_matrix: list[list[int]]) -> list[list[int]]:
-        temperature_matrix = [[self.get_temperature(x, y, elevation_matrix[y][x]) for x in range(General.world_size)] for y in range(General.world_size)]
-        temperature_matrix_np = np.array(temperature_matrix)
-        temperature_sum = convolve2d(temperature_matrix_np, self.square_kernel, mode="same", boundary="fill")
-        temperature_counts = convolve2d(np.ones_like(temperature_matrix_np), self.square_kernel, mode="same", boundary="fill")
-        temperature_smoothed_matrix = temperature_sum / temperature_counts # np array matrix
-        return temperature_smoothed_matrix
-
-    def calculate_humidity_matrix(self, elevation_matrix: list[list[int]]) -> list[list[int]]:
-        humidity_matrix = [[self.get_humidity(x, y, elevation_matrix[y][x]) for x in range(General.world_size)] for y in range(General.world_size)]
-        humidity_matrix_np = np.array(humidity_matrix)
-        humidity_sum = convolve2d(humidity_matrix_np, self.square_kernel, mode="same", boundary="fill")
-        humidity_counts = convolve2d(np.ones_like(humidity_matrix_np), self.square_kernel, mode="same", boundary="fill")
-        humidity_smoothed_matrix = humidity_sum / humidity_counts # np array matrix
-        return humidity_smoothed_matrix
-
-    def calculate_radioactivity_matrix(self) -> list[list[int]]:
-        radioactive_sources, radioactive_drain_positions, radioactive_drain_values = self.get_radioactivity()
-        radioactivity_matrix = np.zeros((General.world_size, General.world_size))
-        for source_y, source_x  in radioactive_sources:
-            radioactivity_matrix[source_y][source_x] = 1
-        for i in range(len(radioactive_drain_values)):
-            drain_y, drain_x = radioactive_drain_positions[i]
-            radioactivity_matrix[drain_y][drain_x] = radioactive_drain_values[i]
-        radioactivity_matrix_np = np.array(radioactivity_matrix)
-        radioactivity_sum = convolve2d(radioactivity_matrix_np, self.circle_kernel, mode="same", boundary="fill")
-        radioactivity_counts = convolve2d(np.ones_like(radioactivity_matrix_np), self.circle_kernel, mode="same", boundary="fill")
-        radioactivity_smoothed_matrix = (radioactivity_sum*10) / radioactivity_counts
-        return radioactivity_smoothed_matrix
-
-    def calculate_productivity_matrix(self, humidity_matrix: list[list[int]], radioactivity_smoothed_matrix: list[list[int]]) -> list[int]:
-        productivity_matrix = [[self.get_productivity(x, y, humidity_matrix[y][x], radioactivity_smoothed_matrix[y][x]) for x in range(General.world_size)] for y in range(General.world_size)]
-        productivity_matrix_np = np.array(productivity_matrix)
-        productivity_sum = convolve2d(productivity_matrix_np, self.square_kernel, mode="same", boundary="fill")
-        productivity_counts = convolve2d(np.ones_like(productivity_matrix_np), self.square_kernel, mode="same", boundary="fill")
-        productivity_smoothed_matrix = productivity_sum / productivity_counts
-        return productivity_smoothed_matrix
+    # the matrices are calculated over the whole map at once by the MapGenerator, get_elevation etc. are the per pixel versions
+    def calculate_elevation_matrix(self) -> np.ndarray:
+        return self.map_generator.smooth(self.map_generator.elevation_layer(), self.map_generator.square_kernel)
+
+    def calculate_temperature_matrix(self, elevation_matrix: np.ndarray) -> np.ndarray:
+        return self.map_generator.smooth(self.map_generator.temperature_layer(elevation_matrix), self.map_generator.square_kernel)
+
+    def calculate_humidity_matrix(self, elevation_matrix: np.ndarray) -> np.ndarray:
+        return self.map_generator.smooth(self.map_generator.humidity_layer(elevation_matrix), self.map_generator.square_kernel)
+
+    def calculate_radioactivity_matrix(self) -> np.ndarray:
+        return self.map_generator.radioactivity_layer()
+
+    def calculate_productivity_matrix(self, humidity_matrix: np.ndarray, radioactivity_smoothed_matrix: np.ndarray) -> np.ndarray:
+        return self.map_generator.smooth(self.map_generator.productivity_layer(humidity_matrix, radioactivity_smoothed_matrix), self.map_generator.square_kernel)
 
     def smooth_the_map(matrix: list[list[float]], smoothing_factor: int = 10) -> list[list[float]]:
         smoothed: list[list[float]] = []
@@ -435,134 +419,90 @@ class Visual():
                 smoothed.append(new_row)
         return smoothed
 
-    def draw_elevation_map(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                elevation_color_no: int = self.determine_elevation_color(self.elevation_matrix[min(General.world_size-1, max(0, int(self.camera_y+y)))][min(General.world_size-1, max(0, int(self.camera_x+x)))])
-                pygame.draw.rect(self.world, self.elevation_colors[elevation_color_no], ((min(General.world_size-1, max(0, int(self.camera_x+x))), min(General.world_size-1, max(0, int(self.camera_y+y))), 9, 9)))
-
-    def draw_temperature_map(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                temperature_color_no: int = self.determine_temperature_color(self.temperature_matrix[min(General.world_size-1, max(0, int(self.camera_y+y)))][min(General.world_size-1, max(0, int(self.camera_x+x)))])
-                pygame.draw.rect(self.world, self.temperature_colors[temperature_color_no], ((min(General.world_size-1, max(0, int(self.camera_x+x))), min(General.world_size-1, max(0, int(self.camera_y+y))), 9, 9)))
-
-    def draw_humidity_map(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                humidity_color_no: int = self.determine_humidity_color(self.humidity_matrix[min(General.world_size-1, max(0, int(self.camera_y+y)))][min(General.world_size-1, max(0, int(self.camera_x+x)))])
-                pygame.draw.rect(self.world, self.humidity_colors[humidity_color_no], ((min(General.world_size-1, max(0, int(self.camera_x+x))), min(General.world_size-1, max(0, int(self.camera_y+y))), 9, 9)))
-
-    def draw_radioactivity_map(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                radioactivity_color_no: int = self.determine_temperature_color(self.radioactivity_matrix[min(General.world_size-1, max(0, int(self.camera_y+y)))][min(General.world_size-1, max(0, int(self.camera_x+x)))])
-                pygame.draw.rect(self.world, self.radioactivity_colors[radioactivity_color_no], ((min(General.world_size-1, max(0, int(self.camera_x+x))), min(General.world_size-1, max(0, int(self.camera_y+y))), 9, 9)))
-
-    def draw_productivity_map(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                productivity_color_no: int = self.determine_productivity_color(self.productivity_matrix[min(General.world_size-1, max(0, int(self.camera_y+y)))][min(General.world_size-1, max(0, int(self.camera_x+x)))])
-                pygame.draw.rect(self.world, self.productivity_colors[productivity_color_no], ((min(General.world_size-1, max(0, int(self.camera_x+x))), min(General.world_size-1, max(0, int(self.camera_y+y))), 9, 9)))
-
-    #3) code snippet for seasonal change
-    def update_temperature_map(self, phase_shift: int = 0, randomness: float = 0) -> None:
-        """Vectorized monthly temperature update for entire matrix"""
-        day_of_year: int = self.month * 30  
-        
-        # Single calculation for all cells
-        radian = (2 * np.pi / 365) * (day_of_year - phase_shift)
-        seasonal_swing = np.sin(radian) * self.elevation_matrix / 50
-        
-        # In-place operations for memory efficiency
-        np.add(self.temperature_matrix, seasonal_swing, out=self.temperature_matrix)
-        if randomness:
-            np.add(self.temperature_matrix, 
-                np.random.uniform(-randomness, randomness, self.temperature_matrix.shape),
-                out=self.temperature_matrix)
-        # In-place clipping avoids creating new array
-        np.clip(self.temperature_matrix, -1.0, 1.0, out=self.temperature_matrix)
-
-    def update_cells_temperature(self, cells_list: list) -> None:
-        if not(cells_list): return
-
-        y_positions = [cell.position_y for cell in cells_list]
-        x_positions = [cell.position_x for cell in cells_list]
-        new_temperatures = self.temperature_matrix[y_positions, x_positions]
-        for cell, temp in zip(cells_list, new_temperatures):
-            cell.temperature_level = temp
-
-    # 4) code snippet for the producers
-    def draw_producers(self) -> None:
-        for producer_cell in Producers.all_producer_cells_list:
-            producer_cell: Producers
-            if (self.camera_x <= producer_cell.position_x < self.camera_x+self.screen_width) and \
-                (self.camera_y <= producer_cell.position_y < self.camera_y+self.screen_height):
-                pygame.draw.rect(self.world, producer_cell.color, (producer_cell.position_x+2, producer_cell.position_y+2, 7, 7))
-
-    def draw_distributors(self) -> None:
-        for distributor_cell in Distributors.all_distributor_cells_list:
-            distributor_cell: Distributors
-            if (self.camera_x <= distributor_cell.position_x < self.camera_x+self.screen_width) and \
-                (self.camera_y <= distributor_cell.position_y < self.camera_y+self.screen_height):
-                pygame.draw.rect(self.world, distributor_cell.color, (distributor_cell.position_x+2, distributor_cell.position_y+2, 7, 7))
-
-    # 5) code snippet for the utilities
-    def draw_corpses(self) -> None:
-        for corpse in Corpse.all_corpses_list:
-            corpse: Corpse
-            pygame.draw.rect(self.world, corpse.color, (corpse.position_x+2, corpse.position_y+2, 7, 7))
-
-    def draw_foods(self) -> None:
-        for food in Food.all_foods_list:
-            food: Food
-            pygame.draw.rect(self.world, food.color, (food.position_x+2, food.position_y+2, 7, 7))
-    
-    def draw_pollens(self) -> None:
-        for pollen in Pollen.all_pollen_list:
-            pollen: Pollen
-            pygame.draw.rect(self.world, pollen.color, (pollen.position_x+2, pollen.position_y+2, 7, 7))
+    def get_map_view(self) -> int:
+        # number of the pre-rendered surface of the chosen map in the tile cache, it is rendered if needed
+        if self.choosen_map == 1:
+            self.tile_cache.get_grid_surface(1, General.colors["gray"])
+            return 1
+        elif self.choosen_map in self.map_views:
+            # the temperature surface is rendered again after every monthly update of the temperature
+            version: int = self.snapshot.temperature_version if self.choosen_map == 4 else 0
+            self.tile_cache.get_surface(self.choosen_map, self.map_views[self.choosen_map], version)
+            return self.choosen_map
+        self.tile_cache.get_blank_surface(0)
+        return 0
+
+    def draw_world(self) -> None:
+        # the world surface is kept between the frames, only the grid cells changed by the simulation are drawn again
+        # the changed cells outside of the camera stay pending until they are seen
+        world_key = (self.choosen_map, self.snapshot.temperature_version if self.choosen_map == 4 else 0,
+                     self.cells_on_map, self.utility_on_map, self.cell_matrix_labels_on_map, self.utility_matrix_labels_on_map)
+        if world_key != self.world_key:
+            # everything is drawn again if the shown map / layers changed
+            self.world_key = world_key
+            self.pending_tile_matrix[:] = True
+
+        tile_rows, tile_columns = self.get_visible_tiles()
+        pending_ys, pending_xs = np.nonzero(self.pending_tile_matrix[tile_rows, tile_columns])
+        if not(len(pending_ys)): return
+        # the box around the pending tiles on the screen is drawn in one go
+        tile_rows = slice(tile_rows.start+int(pending_ys.min()), tile_rows.start+int(pending_ys.max())+1)
+        tile_columns = slice(tile_columns.start+int(pending_xs.min()), tile_columns.start+int(pending_xs.max())+1)
+        self.pending_tile_matrix[tile_rows, tile_columns] = False
+        self.tile_cache.render_region(self.world, self.get_map_view(), tile_rows, tile_columns, self.get_entity_layers(tile_rows, tile_columns))
+        self.draw_labels(tile_rows, tile_columns)
+        self.world_version += 1
+
+    def get_visible_tiles(self) -> tuple[slice, slice]:
+        # the grid cells under the camera
+        view_height = int(self.screen_height/self.zoom_level)
+        view_width = int(self.screen_width/self.zoom_level)
+        tile_count: int = General.world_size//10
+        camera_x, camera_y = int(self.camera_x), int(self.camera_y)
+        return (slice(min(camera_y//10, tile_count), min(-(-(camera_y+view_height)//10), tile_count)),
+                slice(min(camera_x//10, tile_count), min(-(-(camera_x+view_width)//10), tile_count)))
+
+    # 4) code snippet for the cells and the utilities
+    def get_entity_layers(self, tile_rows: slice, tile_columns: slice) -> list[tuple[np.ndarray, np.ndarray]]:
+        # the utility below, the cell above it, like the drawing order of the layers
+        layers: list[tuple[np.ndarray, np.ndarray]] = []
+        if self.utility_on_map:
+            utility_mask = self.snapshot.utility_types[tile_rows, tile_columns] != General.empty_type
+            layers.append((utility_mask, self.snapshot.utility_colors[tile_rows, tile_columns][utility_mask]))
+        if self.cells_on_map:
+            cell_mask = self.snapshot.cell_types[tile_rows, tile_columns] != General.empty_type
+            layers.append((cell_mask, self.snapshot.cell_colors[tile_rows, tile_columns][cell_mask]))
+        return layers
 
     ## 6) DEBUGGING TOOLS
-    def draw_all_cell_matrices_labels(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                # Calculate the actual world coordinates based on camera position
-                world_x = min(General.world_size-1, max(0, int(self.camera_x+x)))
-                world_y = min(General.world_size-1, max(0, int(self.camera_y+y)))
-                # Convert to matrix indices (divide by 10 as your cells are in a 10x10 grid)
-                matrix_x = world_x // 10
-                matrix_y = world_y // 10
-                # Check if within matrix bounds
-                if matrix_x < General.world_size // 10 and matrix_y < General.world_size // 10:
-                    if General.all_cells_matrix[matrix_y, matrix_x]:
-                        cell = General.all_cells_matrix[matrix_y, matrix_x]
-                        if type(cell) == Producers:
-                            cell_label = "P"
-                        elif type(cell) == Distributors:
-                            cell_label = "D"
-                        label_surface = self.font.render(cell_label, True, General.colors["black"])
-                        self.world.blit(label_surface, (world_x+2, world_y+1))
-
-    def draw_all_utility_matrix_labels(self) -> None:
-        for x in range(-30, self.screen_width+30, 10):
-            for y in range(-30, self.screen_height+30, 10):
-                world_x = min(General.world_size-1, max(0, int(self.camera_x+x)))
-                world_y = min(General.world_size-1, max(0, int(self.camera_y+y)))
-                if (world_x//10 < General.world_size//10) and (world_y//10 < General.world_size//10):
-                    single_utility = General.all_utility_matrix[world_y//10, world_x//10]
-                    if single_utility:
-                        if type(single_utility) == Food:
-                            utility_label = "F"
-                        if type(single_utility) == Corpse:
-                            utility_label = "C"
-                        if type(single_utility) == Pollen:
-                            utility_label = "L"
-                        label_surface = self.font.render(utility_label, True, General.colors["black"])
-                        self.world.blit(label_surface, (world_x+2, world_y+1))
+    def draw_labels(self, tile_rows: slice, tile_columns: slice) -> None:
+        # the letters over the cells and the utilities of the tiles
+        if self.utility_matrix_labels_on_map:
+            self.utility_label_overlay.draw(self.world, self.snapshot.utility_types, tile_rows, tile_columns)
+        if self.cell_matrix_labels_on_map:
+            self.cell_label_overlay.draw(self.world, self.snapshot.cell_types, tile_rows, tile_columns)
+
+    def get_text_surface(self, text: str, color: tuple[int, int, int], font: pygame.font.Font) -> pygame.Surface:
+        # the same texts are shown every frame, they are rendered only once
+        key = (text, color, id(font))
+        if key not in self.text_surfaces:
+            # the camera position and the date change, so the old texts are dropped after a while
+            if len(self.text_surfaces) >= 1024:
+                self.text_surfaces.clear()
+            self.text_surfaces[key] = font.render(text, True, color)
+        return self.text_surfaces[key]
+
+    def take_snapshot(self) -> None:
+        # the latest day simulated by the worker, if there is a new one
+        snapshot: Snapshot = self.simulation_runner.take_snapshot()
+        if snapshot is None: return
+        self.snapshot = snapshot
+        self.pending_tile_matrix[snapshot.dirty_tiles[:, 0], snapshot.dirty_tiles[:, 1]] = True
+        self.map_views[4].matrix = snapshot.temperature_tiles
 
     # main running function
     def run(self) -> None:
+        self.simulation_runner.start()
         while self.running:
             for event in pygame.event.get():
                 # keyboard event handling
@@ -620,84 +560,25 @@ class Visual():
                 key_pressed: bool = self.handle_input()
                 
                 # change the map, according to user input
-                #! optimize this, the screen should only be drawn and not the whole world
+                self.draw_world()
                 self.set_camera()
                 self.show_simulation_info()
-                if self.choosen_map == 0:
-                    self.world.fill(General.colors["white"])
-                elif self.choosen_map == 1:
-                    self.world.fill(General.colors["white"])
-                    self.draw_grid_map()
-                elif self.choosen_map == 3:
-                    self.world.fill(General.colors["white"])
-                    self.draw_elevation_map()
-                elif self.choosen_map == 4:
-                    self.world.fill(General.colors["white"])
-                    self.draw_temperature_map()
-                elif self.choosen_map == 5:
-                    self.world.fill(General.colors["white"])
-                    self.draw_humidity_map()
-                elif self.choosen_map == 6:
-                    self.world.fill(General.colors["white"])
-                    self.draw_radioactivity_map()
-                elif self.choosen_map == 7:
-                    self.world.fill(General.colors["white"])
-                    self.draw_productivity_map()
-
-                # check whether non-map ingredients should also be drawn
-                if self.utility_on_map:
-                    self.draw_corpses()
-                    self.draw_foods()
-                    self.draw_pollens()
-                if self.cells_on_map:
-                    self.draw_producers()
-                    self.draw_distributors()
-                if self.utility_matrix_labels_on_map:
-                    self.draw_all_utility_matrix_labels()
-                if self.cell_matrix_labels_on_map:
-                    self.draw_all_cell_matrices_labels()
 
 
                 pygame.display.update()
                 self.clock.tick(self.fps)
 
+                # 1 second = 1 day, the worker catches up to the elapsed real time while the frames go on
                 self.seconds_till_start: int = int((datetime.now() - self.simulation_start_time).total_seconds())
-                self.day = self.seconds_till_start%30
-                self.month = (self.seconds_till_start//30)%12
-                self.year = self.seconds_till_start//360
-                if not(self.day):
-                    previous_day = self.day
-                if self.day != previous_day:
-                    if self.day//29 == 1: # update temperature monthly for the map and the cells
-                        self.update_temperature_map()
-                        self.update_cells_temperature(Cells.all_cells_list)
-                        if self.choosen_map == 4: # update if temperature map is being shown already
-                            self.draw_temperature_map()
-                        
-                    # in game daily loop for the cells / utilities
-                    for producer_cell in Producers.all_producer_cells_list:
-                        producer_cell: Producers
-                        producer_cell.main_loop_producer_cells()
-                    for distributor_cell in Distributors.all_distributor_cells_list:
-                        distributor_cell: Distributors
-                        distributor_cell.main_loop_distributor_cells()
-                    for corpse in Corpse.all_corpses_list:
-                        corpse: Corpse
-                        corpse.corpse_main_loop()
-                    for food in Food.all_foods_list:
-                        food: Food
-                        food.food_main_loop()
-                    for pollen in Pollen.all_pollen_list:
-                        pollen: Pollen
-                        pollen.pollen_main_loop()
-
-                    # Update previous_day for the next check
-                    previous_day = self.day
+                self.simulation_runner.run_until(self.seconds_till_start)
+                self.take_snapshot()
 
+        self.simulation_runner.stop()
         pygame.quit()
         
 # TEST TEST TEST TEST TEST
+# e.g. "python visual.py 42" shows the simulation on map_42.npz
 if __name__ == "__main__":
-    test_visual = Visual()
+    test_visual = Visual(Simulation(map_seed=int(sys.argv[1])) if len(sys.argv) > 1 else None)
     test_visual.run()
     sys.exit()